@@ -0,0 +1,288 @@
+import os
+import json
+import hashlib
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import infra_data
+from spatial_index import EARTH_RADIUS_M, haversine, apartment_coordinates, assemble_filtered
+from distance_profile import PROFILE_MAX_RADIUS_M
+
+# ====================================================================
+# --- 접근성 래스터 (격자 셀별 유형별 최근접 거리 + 표준 반경별 누적 개수) ---
+# ====================================================================
+# 번들 CSV 범위(서울)를 RASTER_CELL_M 격자로 나누고 셀 중심마다 미리 계산해 둔다.
+#   nearest[유형, 셀]        : 셀 중심에서 가장 가까운 시설까지의 haversine 거리 (max_radius 초과는 inf)
+#   counts[유형, 단계, 셀]   : 셀 중심 반경 RADIUS_STEPS[단계] 안의 시설 수 (시설도 셀 중심으로 근사)
+#
+# 빠른 근사 모드의 오차 한계:
+# - 통과 여부는 정확하다. 아파트와 셀 중심의 거리는 bound_m(셀 반대각선 + 0.01 m) 이하이므로
+#   삼각부등식에 의해 |실제 최근접 거리 - nearest| <= bound_m 이다.
+#   nearest <= r - bound_m 이면 확실히 통과, nearest > r + bound_m 이면 확실히 탈락이고,
+#   그 사이(결정 경계 근처)와 래스터 밖의 아파트만 격자 인덱스로 정확히 검사한다.
+# - 개수는 근사치다 (순위/표시용). 확실히 통과한 아파트의 개수는 셀 중심 기준 누적 개수를
+#   표준 반경 사이에서 면적(r²) 비례로 보간한 값이다. 따라서 대략 반경 r ± (bound_m + 셀 반대각선)
+#   안의 실제 개수 사이에 있고, 보간 오차가 더해진다. 정확히 검사한 아파트의 개수는 정확하다.
+#
+# 생성: python access_raster.py build   (.infra_snapshot/raster/ 에 저장, 앱은 mmap 으로 읽음)
+
+RASTER_DIR = os.path.join(infra_data.SNAPSHOT_DIR, 'raster')
+RASTER_FORMAT = 1
+RASTER_CELL_M = 50.0
+RADIUS_STEPS = (250, 500, 1000, 1500, 2000, 3000, 5000)
+NEAREST_SEARCH_RADII = (250, 1000, 2500, PROFILE_MAX_RADIUS_M)   # 최근접 거리를 찾을 때 넓혀 가는 반경
+EXTENT_QUANTILE = 0.001     # 좌표 범위는 양 끝 0.1% 를 제외 (멀리 떨어진 소수 시설 때문에 격자가 커지지 않도록)
+EXTENT_PAD_M = 500.0
+HEATMAP_MAX_PIXELS = 400    # 히트맵 이미지의 긴 변 최대 픽셀 수
+
+
+def infra_fingerprint(infra):
+    # 래스터가 현재 인프라 데이터로 만들어졌는지 확인하는 내용 지문
+    h = hashlib.sha1()
+    for infra_type in sorted(infra.types):
+        arrays = infra.types[infra_type]
+        h.update(infra_type.encode('utf-8'))
+        h.update(np.ascontiguousarray(arrays.lat).tobytes())
+        h.update(np.ascontiguousarray(arrays.lng).tobytes())
+    return h.hexdigest()
+
+
+def _disk_kernel(radius_m, ky, kx, dy_m, dx_m):
+    iy, ix = np.mgrid[-ky:ky + 1, -kx:kx + 1]
+    return (np.hypot(iy * dy_m, ix * dx_m) <= radius_m).astype(np.float64)
+
+
+class AccessRaster:
+    def __init__(self, meta, nearest, counts):
+        self.meta = meta
+        self.nearest = nearest    # (유형 수, ny, nx) float32
+        self.counts = counts      # (유형 수, 단계 수, ny, nx) uint16
+        self.types = {t: i for i, t in enumerate(meta['types'])}
+        self.steps = np.asarray(meta['steps'], dtype=np.float64)
+        self.lat0, self.lng0 = meta['lat0'], meta['lng0']
+        self.cell_dlat, self.cell_dlng = meta['cell_dlat'], meta['cell_dlng']
+        self.ny, self.nx = meta['ny'], meta['nx']
+        self.bound_m = meta['bound_m']
+
+    @property
+    def bounds(self):
+        return [[self.lat0, self.lng0],
+                [self.lat0 + self.ny * self.cell_dlat, self.lng0 + self.nx * self.cell_dlng]]
+
+    @property
+    def nbytes(self):
+        return int(self.nearest.nbytes + self.counts.nbytes)
+
+    # --- 생성 ---
+
+    @classmethod
+    def build(cls, infra, cell_m=RASTER_CELL_M, steps=RADIUS_STEPS, max_radius_m=PROFILE_MAX_RADIUS_M):
+        lat = infra.frame['lat'].to_numpy()
+        lng = infra.frame['lng'].to_numpy()
+        ok = np.isfinite(lat) & np.isfinite(lng)
+        lat_lo, lat_hi = np.quantile(lat[ok], [EXTENT_QUANTILE, 1 - EXTENT_QUANTILE])
+        lng_lo, lng_hi = np.quantile(lng[ok], [EXTENT_QUANTILE, 1 - EXTENT_QUANTILE])
+        lat_mid = (lat_lo + lat_hi) / 2
+
+        cell_dlat = np.degrees(cell_m / EARTH_RADIUS_M)
+        cell_dlng = cell_dlat / np.cos(np.radians(lat_mid))
+        pad_lat = np.degrees(EXTENT_PAD_M / EARTH_RADIUS_M)
+        pad_lng = pad_lat / np.cos(np.radians(lat_mid))
+        lat0, lng0 = lat_lo - pad_lat, lng_lo - pad_lng
+        ny = int(np.ceil((lat_hi + pad_lat - lat0) / cell_dlat))
+        nx = int(np.ceil((lng_hi + pad_lng - lng0) / cell_dlng))
+
+        # 셀 중심 <-> 셀 안의 임의의 점 최대 거리 (위도가 낮은 쪽 행에서 경도 폭이 가장 넓음)
+        corner = [haversine(la + cell_dlat / 2, lng0 + cell_dlng / 2, la + cell_dlat, lng0 + cell_dlng)
+                  for la in (lat0, lat0 + (ny - 1) * cell_dlat)]
+        bound_m = float(max(corner)) + 0.01
+
+        center_lat = lat0 + (np.arange(ny) + 0.5) * cell_dlat
+        center_lng = lng0 + (np.arange(nx) + 0.5) * cell_dlng
+        grid_lat = np.repeat(center_lat, nx)
+        grid_lng = np.tile(center_lng, ny)
+
+        types = sorted(infra.types)
+        spatial_index = infra.spatial_index()
+        nearest = np.full((len(types), ny, nx), np.inf, dtype=np.float32)
+        counts = np.zeros((len(types), len(steps), ny, nx), dtype=np.uint16)
+
+        # 누적 개수: 시설 수 격자(여유 칸 포함)와 원판 커널의 FFT 합성곱
+        dy_m = cell_m
+        dx_m = np.radians(cell_dlng) * EARTH_RADIUS_M * np.cos(np.radians(lat_mid))
+        ky = int(np.ceil(max(steps) / dy_m))
+        kx = int(np.ceil(max(steps) / dx_m))
+        ext_shape = (ny + 2 * ky, nx + 2 * kx)
+        fft_shape = (ext_shape[0] + 2 * ky, ext_shape[1] + 2 * kx)
+        kernels = [np.fft.rfft2(_disk_kernel(r, ky, kx, dy_m, dx_m), fft_shape) for r in steps]
+
+        for t_idx, infra_type in enumerate(types):
+            arrays = infra.types[infra_type]
+            iy = np.floor((arrays.lat - lat0) / cell_dlat) + ky
+            ix = np.floor((arrays.lng - lng0) / cell_dlng) + kx
+            inside = (np.isfinite(iy) & np.isfinite(ix) & (iy >= 0) & (iy < ext_shape[0])
+                      & (ix >= 0) & (ix < ext_shape[1]))
+            hist = np.zeros(ext_shape, dtype=np.float64)
+            np.add.at(hist, (iy[inside].astype(np.int64), ix[inside].astype(np.int64)), 1.0)
+            hist_f = np.fft.rfft2(hist, fft_shape)
+            for s_idx, kernel_f in enumerate(kernels):
+                full = np.fft.irfft2(hist_f * kernel_f, fft_shape)
+                window = full[2 * ky:2 * ky + ny, 2 * kx:2 * kx + nx]
+                counts[t_idx, s_idx] = np.clip(np.rint(window), 0, np.iinfo(np.uint16).max)
+
+            # 최근접 거리: 반경을 넓혀 가며 아직 못 찾은 셀만 다시 질의
+            index = spatial_index.get(infra_type)
+            flat = nearest[t_idx].reshape(-1)
+            remaining = np.arange(ny * nx)
+            for radius_m in NEAREST_SEARCH_RADII:
+                if index is None or len(index) == 0 or len(remaining) == 0:
+                    break
+                for apt_idx, _, dist in index.query_radius_chunks(grid_lat[remaining], grid_lng[remaining], radius_m):
+                    first = np.ones(len(apt_idx), dtype=bool)
+                    first[1:] = apt_idx[1:] != apt_idx[:-1]
+                    flat[remaining[apt_idx[first]]] = dist[first]
+                remaining = remaining[np.isinf(flat[remaining])]
+
+        meta = {'format': RASTER_FORMAT, 'fingerprint': infra_fingerprint(infra), 'cell_m': cell_m,
+                'lat0': float(lat0), 'lng0': float(lng0), 'cell_dlat': float(cell_dlat), 'cell_dlng': float(cell_dlng),
+                'ny': ny, 'nx': nx, 'bound_m': bound_m, 'types': types, 'steps': list(steps),
+                'max_radius_m': max_radius_m}
+        return cls(meta, nearest, counts)
+
+    def save(self, target=None):
+        target = target or RASTER_DIR
+        os.makedirs(target, exist_ok=True)
+        meta_path = os.path.join(target, 'meta.json')
+        if os.path.exists(meta_path):
+            os.remove(meta_path)   # meta.json 을 마지막에 기록 (중간 실패 시 다음 로드에서 무시됨)
+        np.save(os.path.join(target, 'nearest.npy'), self.nearest)
+        np.save(os.path.join(target, 'counts.npy'), self.counts)
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    @classmethod
+    def load(cls, infra, target=None):
+        # 현재 인프라 데이터로 만든 래스터가 있으면 mmap 으로 연다. 없거나 오래됐으면 None
+        target = target or RASTER_DIR
+        try:
+            with open(os.path.join(target, 'meta.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('format') != RASTER_FORMAT or meta.get('fingerprint') != infra_fingerprint(infra):
+            return None
+        nearest = np.load(os.path.join(target, 'nearest.npy'), mmap_mode='r')
+        counts = np.load(os.path.join(target, 'counts.npy'), mmap_mode='r')
+        return cls(meta, nearest, counts)
+
+    # --- 조회 ---
+
+    def cell_of(self, lat, lng):
+        # 좌표 -> 평탄화된 셀 번호 (래스터 밖이거나 좌표가 없으면 -1)
+        iy = np.floor((np.asarray(lat, dtype=np.float64) - self.lat0) / self.cell_dlat)
+        ix = np.floor((np.asarray(lng, dtype=np.float64) - self.lng0) / self.cell_dlng)
+        inside = np.isfinite(iy) & np.isfinite(ix) & (iy >= 0) & (iy < self.ny) & (ix >= 0) & (ix < self.nx)
+        cells = np.full(len(iy), -1, dtype=np.int64)
+        cells[inside] = iy[inside].astype(np.int64) * self.nx + ix[inside].astype(np.int64)
+        return cells
+
+    def nearest_at(self, infra_type, cells):
+        t_idx = self.types[infra_type]
+        return np.asarray(self.nearest[t_idx].reshape(-1)[cells], dtype=np.float64)
+
+    def count_at(self, infra_type, cells, radius_m):
+        # 표준 반경 사이는 면적(r²) 비례 보간, 가장 작은 단계 아래는 0 에서부터 보간
+        t_idx = self.types[infra_type]
+        steps = self.steps
+        radius_m = min(float(radius_m), steps[-1])
+        hi = int(np.searchsorted(steps, radius_m))
+        c_hi = np.asarray(self.counts[t_idx, hi].reshape(-1)[cells], dtype=np.float64)
+        if steps[hi] == radius_m:
+            return c_hi.astype(np.int64)
+        r_lo = steps[hi - 1] if hi > 0 else 0.0
+        c_lo = np.asarray(self.counts[t_idx, hi - 1].reshape(-1)[cells], dtype=np.float64) if hi > 0 else 0.0
+        frac = (radius_m ** 2 - r_lo ** 2) / (steps[hi] ** 2 - r_lo ** 2)
+        return np.rint(c_lo + (c_hi - c_lo) * frac).astype(np.int64)
+
+    def accessibility(self, selected_filters):
+        # 셀별로 선택한 유형 중 반경 안에 시설이 있는 유형의 비율 (0~1). 래스터에 없는 유형은 제외
+        types = [t for t in selected_filters if t in self.types]
+        score = np.zeros((self.ny, self.nx), dtype=np.float32)
+        for infra_type in types:
+            score += self.nearest[self.types[infra_type]] <= selected_filters[infra_type]
+        return score / max(1, len(types))
+
+    def heatmap_image(self, selected_filters):
+        # ImageOverlay 용 RGBA 이미지 (행 0 = 남쪽). 긴 변이 HEATMAP_MAX_PIXELS 이하가 되도록 축소
+        score = self.accessibility(selected_filters)
+        step = max(1, int(np.ceil(max(self.ny, self.nx) / HEATMAP_MAX_PIXELS)))
+        score = score[::step, ::step]
+        rgba = np.zeros(score.shape + (4,), dtype=np.uint8)
+        rgba[..., 0] = (255 * (1 - score)).astype(np.uint8)
+        rgba[..., 1] = (80 + 150 * score).astype(np.uint8)
+        rgba[..., 2] = 60
+        rgba[..., 3] = np.where(score > 0, 70 + 110 * score, 0).astype(np.uint8)
+        return rgba
+
+
+def filter_with_raster(df_apt, raster, spatial_index, selected_filters, top_k=None):
+    # 빠른 근사 모드: 통과 여부는 래스터 + 경계 근처만 정확 검사 (결과 집합은 정확), 개수는 근사
+    if df_apt is None or df_apt.empty or not selected_filters:
+        return pd.DataFrame()
+
+    apt_lat, apt_lng = apartment_coordinates(df_apt)
+    alive = np.flatnonzero(np.isfinite(apt_lat) & np.isfinite(apt_lng))
+    cells = raster.cell_of(apt_lat[alive], apt_lng[alive])
+    counts = {}
+    exact_checked = 0
+
+    for infra_type, radius_m in selected_filters.items():
+        index = spatial_index.get(infra_type)
+        if index is None or len(index) == 0:
+            return pd.DataFrame()
+        if infra_type in raster.types and radius_m <= raster.meta['max_radius_m']:
+            near = np.full(len(alive), np.nan)
+            in_raster = cells >= 0
+            near[in_raster] = raster.nearest_at(infra_type, cells[in_raster])
+            sure_in = near <= radius_m - raster.bound_m
+            sure_out = near > radius_m + raster.bound_m
+        else:
+            sure_in = sure_out = np.zeros(len(alive), dtype=bool)
+        check = np.flatnonzero(~sure_in & ~sure_out)   # 결정 경계 근처 / 래스터 밖 -> 정확 검사
+        exact_checked += len(check)
+
+        c = np.zeros(len(alive), dtype=np.int64)
+        if sure_in.any():
+            c[sure_in] = np.maximum(1, raster.count_at(infra_type, cells[sure_in], radius_m))
+        if len(check):
+            c[check] = index.count_within(apt_lat[alive[check]], apt_lng[alive[check]], radius_m)
+        keep = c > 0
+        alive, cells = alive[keep], cells[keep]
+        for t in counts:
+            counts[t] = counts[t][keep]
+        counts[infra_type] = c[keep]
+        if len(alive) == 0:
+            break
+
+    df_filtered = assemble_filtered(df_apt, alive, counts, selected_filters, top_k=top_k)
+    df_filtered.attrs['exact_checked'] = exact_checked
+    return df_filtered
+
+
+if __name__ == "__main__":
+    import time
+    from infra_store import InfraStore
+
+    parser = argparse.ArgumentParser(description="접근성 래스터 생성")
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('--cell', type=float, default=RASTER_CELL_M, help="셀 크기 (m)")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    df_infra, _ = infra_data.load_all_infrastructure_data()
+    raster = AccessRaster.build(InfraStore(df_infra), cell_m=args.cell)
+    raster.save()
+    print(f"✅ {raster.ny}x{raster.nx} 셀, 유형 {len(raster.types)}개, {raster.nbytes / 1e6:.1f} MB, "
+          f"오차 한계 {raster.bound_m:.1f} m ({time.perf_counter() - started:.1f}s) -> {RASTER_DIR}")
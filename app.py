@@ -1,211 +1,293 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 import pandas as pd
 import numpy as np
-import folium
-import streamlit.components.v1 as components
+import infra_data
+import profiling
+import warmup
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from spatial_index import GridSpatialIndex, haversine_rad, filter_with_index, assemble_filtered, apartment_coordinates
+from distance_profile import PROFILE_MAX_RADIUS_M, DistanceProfileSet, filter_with_profiles
+from result_cache import LRUResultCache
+from apt_ingest import MissingColumnsError, read_apartment_csv
+from infra_store import InfraStore
+from result_export import EXPORT_FORMATS, available_formats, build_export, result_fingerprint
+from query_service import QueryRejected, QueryService
+from access_raster import AccessRaster, filter_with_raster
+
+logger = logging.getLogger(__name__)
 
 # ====================================================================
 # --- 1. 헬퍼 함수 정의 (데이터 로드 및 거리 계산) ---
 # ====================================================================
 
-@st.cache_data(show_spinner="인프라 데이터 통합 로드 중...")
-def load_all_infrastructure_data():
-    all_data = []
-    debug_info = [] 
-    
-    def read_csv_safe(file_path):
-        encodings = ['utf-8', 'cp949', 'euc-kr']
-        for enc in encodings:
-            try:
-                return pd.read_csv(file_path, encoding=enc)
-            except UnicodeDecodeError:
-                continue
-        raise ValueError(f"❌ '{file_path}' 파일을 읽을 수 없습니다.")
-    
-    # 1. 학교
-    try:
-        df_school = read_csv_safe("school.csv")
-        df_school = df_school.rename(columns={'school_name': 'infra_name'})
-        all_data.append(df_school[['type', 'infra_name', 'lat', 'lng']])
-        debug_info.append(f"✅ 학교: {len(df_school)}개 로드")
-    except: debug_info.append("❌ 학교 파일 없음/오류")
-        
-    # 2. 문화시설
-    try:
-        df_art = read_csv_safe("art.csv")
-        df_art['type'] = '문화시설'
-        df_art = df_art.rename(columns={'문화시설명': 'infra_name'})
-        all_data.append(df_art[['type', 'infra_name', 'lat', 'lng']])
-        debug_info.append(f"✅ 문화시설: {len(df_art)}개 로드")
-    except: debug_info.append("❌ 문화시설 파일 없음/오류")
-
-    # 3. 병원 (대형/일반 분류 로직 포함)
-    try:
-        df_hospital = read_csv_safe("hospital.csv")
-        def classify_hospital(row):
-            val = str(row.get('응급의료기관코드명', ''))
-            if '응급' in val and '이외' not in val: return '대형병원'
-            if row.get('응급실운영여부(1/2)') == 1: return '대형병원'
-            return '일반병원' 
-
-        df_hospital['type'] = df_hospital.apply(classify_hospital, axis=1)
-        if '기관명' in df_hospital.columns:
-            df_hospital = df_hospital.rename(columns={'기관명': 'infra_name'})
-            all_data.append(df_hospital[['type', 'infra_name', 'lat', 'lng']])
-            debug_info.append(f"✅ 병원: {len(df_hospital)}개 로드")
-    except: debug_info.append("❌ 병원 파일 없음/오류")
-
-    # 4. 공원
-    try:
-        df_park = read_csv_safe("park.csv")
-        df_park['type'] = '공원'
-        df_park = df_park.rename(columns={'공원명': 'infra_name'})
-        all_data.append(df_park[['type', 'infra_name', 'lat', 'lng']])
-        debug_info.append(f"✅ 공원: {len(df_park)}개 로드")
-    except: debug_info.append("❌ 공원 파일 없음/오류")
-
-    # 5. 버스정류장
-    try:
-        df_bus = read_csv_safe("bus_stop.csv")
-        df_bus['type'] = '버스정류장'
-        df_bus = df_bus.rename(columns={'name': 'infra_name'})
-        all_data.append(df_bus[['type', 'infra_name', 'lat', 'lng']])
-        debug_info.append(f"✅ 버스정류장: {len(df_bus)}개 로드")
-    except: debug_info.append("❌ 버스정류장 파일 없음/오류")
-
-    # 6. 지하철역
-    try:
-        df_subway = read_csv_safe("subway.csv")
-        df_subway['type'] = '지하철역'
-        if 'name' in df_subway.columns: df_subway = df_subway.rename(columns={'name': 'infra_name'})
-        elif '역사명' in df_subway.columns: df_subway = df_subway.rename(columns={'역사명': 'infra_name'})
-        all_data.append(df_subway[['type', 'infra_name', 'lat', 'lng']])
-        debug_info.append(f"✅ 지하철역: {len(df_subway)}개 로드")
-    except: debug_info.append("❌ 지하철역 파일 없음/오류")
-
-    # 7. 대형마트
-    try:
-        df_market = read_csv_safe("big_market.csv")
-        df_market['type'] = df_market.get('업태구분명', '대형마트')
-        df_market = df_market.rename(columns={'사업장명': 'infra_name'})
-        all_data.append(df_market[['type', 'infra_name', 'lat', 'lng']])
-        debug_info.append(f"✅ 대형마트: {len(df_market)}개 로드")
-    except: debug_info.append("❌ 대형마트 파일 없음/오류")
-
-    # 8. 체육시설
-    try:
-        df_gym = read_csv_safe("gym.csv")
-        df_gym = df_gym.rename(columns={'name': 'infra_name', '위도': 'lat', '경도': 'lng'})
-        df_gym['type'] = df_gym['type'].fillna('기타')
-        all_data.append(df_gym[['type', 'infra_name', 'lat', 'lng']])
-        debug_info.append(f"✅ 체육시설: {len(df_gym)}개 로드")
-    except: debug_info.append("❌ 체육시설 파일 없음/오류")
-
-    if not all_data: return pd.DataFrame(), debug_info
-    return pd.concat(all_data, ignore_index=True), debug_info
-
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371.0
-    lat1_rad, lon1_rad = np.radians(lat1), np.radians(lon1)
-    lat2_rad, lon2_rad = np.radians(lat2), np.radians(lon2)
-    dlon = lon2_rad - lon1_rad
-    dlat = lat2_rad - lat1_rad
-    a = np.sin(dlat / 2)**2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon / 2)**2
-    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
-    return R * c * 1000.0
-
-@st.cache_data(show_spinner="필터링 로직 실행 중...")
-def filter_apartments(df_apt, df_infra, selected_filters):
+@st.cache_resource(show_spinner="인프라 데이터 통합 로드 중...", max_entries=1)
+def get_infra_store(signature=None):
+    # 프로세스 전체가 복사 없이 공유하는 읽기 전용 인프라 저장소 (st.cache_data 와 달리 세션마다 복제하지 않음).
+    # signature(소스 CSV 별 mtime/크기)가 바뀌면 새로 만들고,
+    # 실제 재파싱은 infra_data 스냅샷에서 변경된 소스에 대해서만 일어남
+    with profiling.cached_body('get_infra_store'):
+        df_infra, debug_info = infra_data.load_all_infrastructure_data()
+        return InfraStore(df_infra, debug_info)
+
+def get_spatial_index(signature=None):
+    # 유형별 격자 인덱스는 저장소당 한 번만 생성되어 모든 세션이 공유
+    return get_infra_store(signature).spatial_index()
+
+@st.cache_resource(max_entries=1)
+def get_access_raster(signature=None):
+    # 미리 만든 접근성 래스터(python access_raster.py build)를 mmap 으로 공유. 없거나 오래됐으면 None
+    return AccessRaster.load(get_infra_store(signature))
+
+@st.cache_resource(show_spinner=False)
+def get_warmup(signature=None):
+    # 프로세스당 한 번, 첫 스크립트 실행(첫 방문자 또는 스크립트 상태 확인) 때 백그라운드에서
+    # 인프라 로드 -> 공간 인덱스 -> 래스터 -> 지도 모듈 import 순으로 미리 준비하고 준비 파일 기록 (warmup.py 참고)
+    return warmup.start_background(lambda: get_infra_store(signature), lambda: get_access_raster(signature), signature)
+
+@st.cache_resource
+def get_result_cache():
+    # 프로세스 전체가 공유하는 유형별 중간 결과(프로파일, 반경별 개수) 캐시. 메모리 예산 초과 시 LRU 제거
+    return LRUResultCache()
+
+@st.cache_resource
+def get_query_service():
+    # 프로세스 전체가 공유하는 질의 서비스: 같은 질의는 한 번만 계산, 무거운 계산은 제한된 작업 풀에서
+    return QueryService()
+
+def run_query(key, compute, cost=0):
+    # 스크립트 스레드는 결과만 기다림. 반환: (결과, 다른 세션의 진행 중 질의와 합쳐졌는지)
+    future, coalesced = get_query_service().submit(key, compute, cost)
+    if not future.done():
+        with st.spinner("같은 조건의 분석 결과를 기다리는 중..." if coalesced else "분석 중..."):
+            return future.result(), coalesced
+    return future.result(), coalesced
+
+@st.cache_resource
+def get_profile_pool():
+    # 거리 프로파일 백그라운드 생성 전용 스레드 1개 (첫 질의는 공간 인덱스로 바로 답함)
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix='profile-build')
+
+@st.cache_resource(max_entries=4)
+def get_distance_profiles(apt_fingerprint, signature, _df_apt):
+    # 업로드 파일 지문 x 인프라 로드 단위의 프로파일 묶음 (좌표 배열만 보관하는 가벼운 객체).
+    # 유형별 프로파일 자체는 결과 캐시에 보관: 처음 체크된 유형은 공간 인덱스로 바로 답하고
+    # 예산 안이면 백그라운드에서 만들어, 이후 슬라이더 이동은 이진 탐색만 수행
+    spatial_index = get_spatial_index(signature)
+    with profiling.cached_body('get_distance_profiles'):
+        return DistanceProfileSet(_df_apt, spatial_index, cache=get_result_cache(),
+                                  key_prefix=(apt_fingerprint, signature), executor=get_profile_pool())
+
+def export_data(fmt, fingerprint, df_map, display_cols, rename_map, selected_filters, infra, spatial_index):
+    # 다운로드 버튼의 지연 생성 함수: 클릭했을 때만 (별도 스레드에서) 파일을 만들고,
+    # 같은 결과 지문 x 형식은 결과 캐시에서 바로 반환. 재실행 밖에서 실행되므로 성능 로그에 별도 줄로 기록
+    cache = get_result_cache()
+    def build():
+        with profiling.detached_stage('export', rows=len(df_map), format=fmt) as rec:
+            table = df_map[display_cols].rename(columns=rename_map)
+            data = cached_compute(cache, ('export', fingerprint, fmt),
+                                  lambda: build_export(fmt, df_map, table, selected_filters, infra, spatial_index), rec)
+            rec['bytes'] = len(data)
+        return data
+    return build
+
+def upload_fingerprint(uploaded_file):
+    # 업로드 파일 내용의 가벼운 지문. 같은 업로드(file_id)는 재실행마다 다시 해시하지 않음
+    state_key = f"_upload_fp:{getattr(uploaded_file, 'file_id', uploaded_file.name)}:{uploaded_file.size}"
+    if state_key not in st.session_state:
+        digest = hashlib.blake2b(uploaded_file.getvalue(), digest_size=16).hexdigest()
+        st.session_state[state_key] = f"{uploaded_file.size}:{digest}"
+    return st.session_state[state_key]
+
+def load_uploaded_apartments(uploaded_file, apt_fingerprint):
+    # 업로드 1건당 한 번만 파싱해 세션에 보관 (재실행마다 CSV 를 다시 읽지 않음)
+    cached = st.session_state.get('_uploaded_apartments')
+    if cached is not None and cached[0] == apt_fingerprint:
+        return cached[1], cached[2]
+    progress = st.sidebar.progress(0.0, text="CSV 읽는 중...")
+    df_apt, report = read_apartment_csv(
+        uploaded_file,
+        progress_callback=lambda frac, rows: progress.progress(frac, text=f"CSV 읽는 중... {rows:,}행"))
+    progress.empty()
+    st.session_state['_uploaded_apartments'] = (apt_fingerprint, df_apt, report)
+    return df_apt, report
+
+def _type_counts(df_apt, infra_type, radius_m, spatial_index, profiles):
+    # 한 유형/반경에 대한 전체 아파트의 반경 내 시설 수 (시설이 없는 유형은 None)
+    index = spatial_index.get(infra_type)
+    if index is None or len(index) == 0:
+        return None
+    if profiles is not None:
+        counts = profiles.counts(infra_type, radius_m, np.arange(len(df_apt), dtype=np.int64))
+    else:
+        apt_lat, apt_lng = apartment_coordinates(df_apt)
+        counts = index.count_within(apt_lat, apt_lng, radius_m)
+    return counts.astype(np.int32)
+
+def filter_apartments(df_apt, infra, selected_filters, spatial_index=None, profiles=None, cache_key=None, top_k=None, cache=None, raster=None):
+    # cache_key(업로드 지문, 인프라 서명)가 있으면 (유형, 반경)별 개수 배열을 결과 캐시에서 재사용하고
+    # 새 조합은 캐시된 유형별 결과의 AND 로 계산. 없으면 한 번만 계산 (배치/벤치마크)
+    # top_k: 총 개수 상위 k 개만 반환 (조건을 통과한 전체 개수는 결과의 attrs['matched'])
+    # 결과 캐시를 쓴 경우 유형별 개수 배열의 캐시 적중 수는 attrs['type_cache_hits']
+    # raster: 빠른 근사 모드 (통과 여부는 정확, 개수는 래스터 근사 - access_raster 참고)
     if df_apt is None or df_apt.empty or not selected_filters:
         return pd.DataFrame()
 
-    filtered_apt_list = []
-    
-    # 인프라 데이터 미리 필터링 (속도 최적화)
-    infra_dict = {}
-    for infra_type in selected_filters.keys():
-        infra_dict[infra_type] = df_infra[df_infra['type'] == infra_type].copy()
-
-    for index, apt in df_apt.iterrows():
-        apt_lat = apt['lat']
-        apt_lng = apt['lng']
-        
-        meets_all_criteria = True
-        individual_counts = {f'{t}_카운트': 0 for t in selected_filters.keys()}
-
-        for infra_type, radius_m in selected_filters.items():
-            infra_of_type = infra_dict[infra_type]
-            if infra_of_type.empty:
-                meets_all_criteria = False; break
-
-            distances = haversine(apt_lat, apt_lng, infra_of_type['lat'].values, infra_of_type['lng'].values)
-            
-            # 하나라도 반경 내에 없으면 탈락 (AND 조건)
-            if np.min(distances) > radius_m:
-                meets_all_criteria = False; break
-
-            count_type = np.sum(distances <= radius_m)
-            individual_counts[infra_type + '_카운트'] = int(count_type)
-
-        if meets_all_criteria:
-            apt_data = apt.to_dict() # 여기서 원본 컬럼(주소 포함)이 다 들어감
-            apt_data.update(individual_counts)
-            if '자치구명' not in apt_data: apt_data['자치구명'] = ''
-            filtered_apt_list.append(apt_data)
-
-    df_filtered_apt = pd.DataFrame(filtered_apt_list)
-    
-    if df_filtered_apt.empty:
-        return pd.DataFrame()
-
-    count_cols = [col for col in df_filtered_apt.columns if col.endswith('_카운트')]
-    df_filtered_apt['Total_Count'] = df_filtered_apt[count_cols].sum(axis=1)
-        
-    return df_filtered_apt.sort_values(by='Total_Count', ascending=False).drop(columns=['Total_Count']).copy()
-
-def get_apartment_infrastructure_details(apt_data, df_infra, selected_filters):
-    apt_lat = apt_data['latitude']
-    apt_lng = apt_data['longitude']
+    # 유형별 공간 인덱스로 전체 아파트를 일괄 반경 질의 (아파트 x 시설 전수 비교 제거)
+    if spatial_index is None:
+        spatial_index = infra.spatial_index()
+    if raster is not None:
+        return filter_with_raster(df_apt, raster, spatial_index, selected_filters, top_k=top_k)
+    if cache_key is None:
+        if profiles is not None:
+            return filter_with_profiles(df_apt, profiles, selected_filters, top_k=top_k)
+        return filter_with_index(df_apt, spatial_index, selected_filters, top_k=top_k)
+
+    if cache is None:
+        cache = get_result_cache()
+    mask = np.ones(len(df_apt), dtype=bool)
+    type_counts = {}
+    hits = 0
+    for infra_type, radius_m in selected_filters.items():
+        # 캐시 전체 적중 카운터는 다른 세션/미리 그리기 스레드와 공유 -> 이 질의의 적중은 직접 셈
+        ran = []
+        counts = cache.get_or_compute(
+            tuple(cache_key) + ('counts', infra_type, radius_m),
+            lambda: ran.append(True) or _type_counts(df_apt, infra_type, radius_m, spatial_index, profiles))
+        hits += not ran
+        if counts is None:
+            return pd.DataFrame()
+        type_counts[infra_type] = counts
+        mask &= counts > 0
+
+    alive = np.flatnonzero(mask)
+    counts = {t: c[alive].astype(np.int64) for t, c in type_counts.items()}
+    df_filtered = assemble_filtered(df_apt, alive, counts, selected_filters, top_k=top_k)
+    df_filtered.attrs['type_cache_hits'] = hits
+    return df_filtered
+
+def get_apartment_infrastructure_details(apt_data, infra, selected_filters, profiles=None, apt_pos=None):
+    # profiles(필터링이 만든 아파트 -> 시설 이웃 그래프)가 메모리에 있고 매물의 업로드 내 위치(apt_pos)를 알면
+    # 그래프를 슬라이스만 하고, 아니면 저장소의 유형별 좌표 배열(라디안, cos(위도) 사전 계산)과 한 번에 거리 계산
+    apt_lat_rad = np.radians(float(apt_data['latitude']))
+    apt_lng_rad = np.radians(float(apt_data['longitude']))
+    apt_cos = np.cos(apt_lat_rad)
     details_list = []
     
     for infra_type, radius_m in selected_filters.items():
-        infra_of_type = df_infra[df_infra['type'] == infra_type]
-        for idx, item in infra_of_type.iterrows():
-            distance = haversine(apt_lat, apt_lng, item['lat'], item['lng'])
-            if distance <= radius_m:
-                details_list.append({
-                    '인프라_유형': infra_type,
-                    '시설명': item['infra_name'],
-                    '거리(m)': int(round(distance)),
-                    'lat': item['lat'],  
-                    'lng': item['lng']    
-                })
-    return pd.DataFrame(details_list).sort_values(by='거리(m)')
+        arrays = infra.of_type(infra_type)
+        if arrays is None:
+            continue
+        sliced = profiles.neighbors(infra_type, radius_m, apt_pos) if profiles is not None and apt_pos is not None else None
+        if sliced is not None:
+            hit, distance = sliced
+        else:
+            distance = haversine_rad(apt_lat_rad, apt_lng_rad, apt_cos, arrays.lat_rad, arrays.lng_rad, arrays.cos_lat)
+            hit = np.flatnonzero(distance <= radius_m)
+            distance = distance[hit]
+        details_list.append(pd.DataFrame({
+            '인프라_유형': infra_type,
+            '시설명': infra.names[arrays.name_codes[hit]],
+            '거리(m)': np.round(distance).astype(int),
+            'lat': arrays.lat[hit],
+            'lng': arrays.lng[hit],
+        }))
+    if not details_list:
+        return pd.DataFrame(columns=['인프라_유형', '시설명', '거리(m)', 'lat', 'lng'])
+    return pd.concat(details_list, ignore_index=True).sort_values(by='거리(m)', kind='stable')
 
 # ====================================================================
 # --- 2. 지도 생성 함수 ---
 # ====================================================================
 
-def create_folium_map(df_map, df_infra, selected_filters):
+# 지도에 올릴 마커(인프라 + 아파트)가 이 개수를 넘으면 유형별 클러스터 레이어로 렌더링
+MAP_BULK_MARKER_THRESHOLD = int(os.environ.get('INFRA_MAP_BULK_MARKERS', '1000'))
+# 요약 화면에서 상세 지도를 미리 그려 두는 상위 매물 수
+PRERENDER_TOP_N = 10
+
+INFRA_COLORS = {'초등학교': 'blue', '중학교': 'green', '고등학교': 'orange', '문화시설': 'purple', '공원': 'darkgreen', '대형병원': 'red', '일반병원': 'lightred', '버스정류장': 'cadetblue', '지하철역': 'darkblue', '대형마트': 'pink', '백화점': 'beige', '수영장': 'lightblue', '생활체육관': 'lightgreen', '축구장': 'lightgreen', '야구장': 'orange', '농구장': 'orange', '테니스장': 'lightgreen', '배드민턴장': 'cadetblue', '골프연습장': 'green', '기타': 'gray'}
+INFRA_ICONS = {'초등학교': 'graduation-cap', '중학교': 'university', '고등학교': 'landmark', '문화시설': 'palette', '공원': 'tree', '대형병원': 'ambulance', '일반병원': 'plus-square', '버스정류장': 'bus', '지하철역': 'subway', '대형마트': 'shopping-cart', '백화점': 'gift', '수영장': 'person-swimming', '생활체육관': 'dumbbell', '축구장': 'futbol', '야구장': 'baseball-bat-ball', '농구장': 'basketball', '테니스장': 'table-tennis-paddle-ball', '배드민턴장': 'feather', '골프연습장': 'golf-ball-tee', '기타': 'star'}
+
+def find_relevant_infra(df_map, infra, selected_filters, profiles=None):
+    # 필터링된 아파트 중 하나라도 반경 안에 두고 있는 시설만 선택.
+    # profiles(이웃 그래프)가 메모리에 있는 유형은 결과 아파트 위치(인덱스 = 업로드 내 위치)의 이웃 시설 합집합으로,
+    # 나머지는 아파트 쪽에 격자 인덱스를 만들고 유형별로 시설 전체를 한 번에 질의 (벡터화된 관련성 마스크)
+    apt_pos = df_map.index.to_numpy() if profiles is not None else None
+    apt_index = None
+    relevant = []
+    for infra_type, radius_m in selected_filters.items():
+        arrays = infra.of_type(infra_type)
+        if arrays is None:
+            continue
+        rows = profiles.facilities_within(infra_type, radius_m, apt_pos) if apt_pos is not None else None
+        if rows is not None:
+            relevant.append(infra.frame_of_type(infra_type).iloc[rows])
+            continue
+        if apt_index is None:
+            apt_index = GridSpatialIndex(df_map['latitude'].values, df_map['longitude'].values)
+        mask = apt_index.count_within(arrays.lat, arrays.lng, radius_m) > 0
+        relevant.append(infra.frame_of_type(infra_type)[mask])
+    if not relevant:
+        return pd.DataFrame(columns=['type', 'infra_name', 'lat', 'lng'])
+    return pd.concat(relevant, ignore_index=True).drop_duplicates(subset=['infra_name', 'lat', 'lng'])
+
+def show_map_html(html):
+    # 지도 관련 모듈(folium, components)은 처음 지도를 그릴 때 import (기동 시간 단축, 워밍업이 미리 적재)
+    import streamlit.components.v1 as components
+    return components.html(html, height=740, scrolling=True)
+
+def add_clustered_markers(m, name, lats, lngs, popups, color, icon):
+    # FastMarkerCluster: 좌표/팝업만 JSON 으로 넘기고 아이콘은 레이어당 한 번만 정의
+    from folium.plugins import FastMarkerCluster
+    callback = """(function () {
+        var icon = L.AwesomeMarkers.icon({icon: '%s', prefix: 'fa', markerColor: '%s'});
+        return function (row) {
+            var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+            marker.bindPopup(row[2]);
+            return marker;
+        };
+    })()""" % (icon, color)
+    data = [[float(lat), float(lng), str(popup)] for lat, lng, popup in zip(lats, lngs, popups)]
+    FastMarkerCluster(data, callback=callback, name=name, show=True).add_to(m)
+
+def add_accessibility_heatmap(m, raster, selected_filters):
+    # 래스터 셀별 '선택 유형 중 반경 안에 시설이 있는 비율' 레이어 (레이어 목록에서 켜서 확인)
+    import folium
+    folium.raster_layers.ImageOverlay(
+        image=raster.heatmap_image(selected_filters), bounds=raster.bounds, origin='lower',
+        mercator_project=True, name="접근성 히트맵", show=False, opacity=1.0,
+    ).add_to(m)
+
+def render_folium_map(df_map, infra, selected_filters, bulk_threshold=None, raster=None, profiles=None):
+    # 지도 HTML 만 생성 (Streamlit 호출 없음 -> 질의 서비스 작업 스레드에서도 실행 가능)
+    import folium
     center_lat = df_map['latitude'].mean()
     center_lng = df_map['longitude'].mean()
 
     m = folium.Map(location=[center_lat, center_lng], zoom_start=12, tiles='https://xdworld.vworld.kr/2d/Base/service/{z}/{x}/{y}.png', attr='Vworld')
     
-    colors = {'초등학교': 'blue', '중학교': 'green', '고등학교': 'orange', '문화시설': 'purple', '공원': 'darkgreen', '대형병원': 'red', '일반병원': 'lightred', '버스정류장': 'cadetblue', '지하철역': 'darkblue', '대형마트': 'pink', '백화점': 'beige', '수영장': 'lightblue', '생활체육관': 'lightgreen', '축구장': 'lightgreen', '야구장': 'orange', '농구장': 'orange', '테니스장': 'lightgreen', '배드민턴장': 'cadetblue', '골프연습장': 'green', '기타': 'gray'}
-    icons = {'초등학교': 'graduation-cap', '중학교': 'university', '고등학교': 'landmark', '문화시설': 'palette', '공원': 'tree', '대형병원': 'ambulance', '일반병원': 'plus-square', '버스정류장': 'bus', '지하철역': 'subway', '대형마트': 'shopping-cart', '백화점': 'gift', '수영장': 'person-swimming', '생활체육관': 'dumbbell', '축구장': 'futbol', '야구장': 'baseball-bat-ball', '농구장': 'basketball', '테니스장': 'table-tennis-paddle-ball', '배드민턴장': 'feather', '골프연습장': 'golf-ball-tee', '기타': 'star'}
     
-    relevant_infra_list = []
-    # 인프라 마커 추가 로직
-    for infra_type, radius_m in selected_filters.items():
-        infra_of_type = df_infra[df_infra['type'] == infra_type].copy()
-        # 벡터화 연산으로 거리 계산 최적화 가능하나 여기선 순회 유지
-        for idx, item in infra_of_type.iterrows():
-            distances = haversine(item['lat'], item['lng'], df_map['latitude'].values, df_map['longitude'].values)
-            if np.min(distances) <= radius_m:
-                 relevant_infra_list.append(item.to_dict())
-
-    df_relevant_infra = pd.DataFrame(relevant_infra_list).drop_duplicates(subset=['infra_name', 'lat', 'lng'])
+    df_relevant_infra = find_relevant_infra(df_map, infra, selected_filters, profiles)
+    if raster is not None:
+        add_accessibility_heatmap(m, raster, selected_filters)
+
+    if bulk_threshold is None:
+        bulk_threshold = MAP_BULK_MARKER_THRESHOLD
+    if len(df_relevant_infra) + len(df_map) > bulk_threshold:
+        # 대량 결과: 유형별 클러스터 레이어 하나씩 (마커는 브라우저에서 생성)
+        for infra_type, group in df_relevant_infra.groupby('type', sort=False):
+            add_clustered_markers(m, f"{infra_type} ({len(group)})", group['lat'].values, group['lng'].values,
+                                  group['infra_name'].astype(str).values,
+                                  INFRA_COLORS.get(infra_type, 'gray'), INFRA_ICONS.get(infra_type, 'star'))
+        apt_popups = (df_map['자치구명'].astype(str) + " " + df_map['건물명'].astype(str)).values
+        add_clustered_markers(m, "필터링된 아파트", df_map['latitude'].values, df_map['longitude'].values,
+                              apt_popups, 'darkpurple', 'home')
+        folium.LayerControl(collapsed=True).add_to(m)
+        return m.get_root().render()
 
     if not df_relevant_infra.empty:
         infra_group = folium.FeatureGroup(name="발견된 인프라", show=True).add_to(m)
@@ -213,7 +295,7 @@ def create_folium_map(df_map, df_infra, selected_filters):
             folium.Marker(
                 location=[item['lat'], item['lng']],
                 popup=f"{item['infra_name']}",
-                icon=folium.Icon(color=colors.get(item['type'], 'gray'), icon=icons.get(item['type'], 'star'), prefix='fa')
+                icon=folium.Icon(color=INFRA_COLORS.get(item['type'], 'gray'), icon=INFRA_ICONS.get(item['type'], 'star'), prefix='fa')
             ).add_to(infra_group)
 
     # 아파트 마커
@@ -226,9 +308,10 @@ def create_folium_map(df_map, df_infra, selected_filters):
         ).add_to(apt_group)
         
     folium.LayerControl(collapsed=True).add_to(m)
-    return components.html(m.get_root().render(), height=740, scrolling=True)
+    return m.get_root().render()
 
-def create_detailed_map(apt_data, df_details):
+def render_detailed_map(apt_data, df_details):
+    import folium
     center_lat = apt_data['latitude']
     center_lng = apt_data['longitude']
     m = folium.Map(location=[center_lat, center_lng], zoom_start=14, tiles='https://xdworld.vworld.kr/2d/Base/service/{z}/{x}/{y}.png', attr='Vworld')
@@ -240,28 +323,138 @@ def create_detailed_map(apt_data, df_details):
         icon=folium.Icon(color='black', icon='building', prefix='fa')
     ).add_to(m)
     
-    colors = {'초등학교': 'blue', '중학교': 'green', '고등학교': 'orange', '문화시설': 'purple', '공원': 'darkgreen', '대형병원': 'red', '일반병원': 'lightred', '버스정류장': 'cadetblue', '지하철역': 'darkblue', '대형마트': 'pink', '백화점': 'beige', '수영장': 'lightblue', '생활체육관': 'lightgreen', '축구장': 'lightgreen', '야구장': 'orange', '농구장': 'orange', '테니스장': 'lightgreen', '배드민턴장': 'cadetblue', '골프연습장': 'green', '기타': 'gray'}
-    icons = {'초등학교': 'graduation-cap', '중학교': 'university', '고등학교': 'landmark', '문화시설': 'palette', '공원': 'tree', '대형병원': 'ambulance', '일반병원': 'plus-square', '버스정류장': 'bus', '지하철역': 'subway', '대형마트': 'shopping-cart', '백화점': 'gift', '수영장': 'person-swimming', '생활체육관': 'dumbbell', '축구장': 'futbol', '야구장': 'baseball-bat-ball', '농구장': 'basketball', '테니스장': 'table-tennis-paddle-ball', '배드민턴장': 'feather', '골프연습장': 'golf-ball-tee', '기타': 'star'}
 
     for idx, item in df_details.iterrows():
         itype = item['인프라_유형']
         folium.Marker(
             location=[item['lat'], item['lng']],
             popup=f"{item['시설명']} ({item['거리(m)']}m)",
-            icon=folium.Icon(color=colors.get(itype,'gray'), icon=icons.get(itype,'star'), prefix='fa')
+            icon=folium.Icon(color=INFRA_COLORS.get(itype,'gray'), icon=INFRA_ICONS.get(itype,'star'), prefix='fa')
         ).add_to(m)
         folium.PolyLine(
             locations=[(center_lat, center_lng), (item['lat'], item['lng'])],
-            color=colors.get(itype,'gray'), weight=2, opacity=0.7
+            color=INFRA_COLORS.get(itype,'gray'), weight=2, opacity=0.7
         ).add_to(m)
 
-    return components.html(m.get_root().render(), height=740, scrolling=True)
+    return m.get_root().render()
+
+def apartment_detail_data(row):
+    return {
+        'latitude': row['latitude'], 
+        'longitude': row['longitude'], 
+        '건물명': row['건물명'],
+        '자치구명': row['자치구명']
+    }
+
+def detail_cache_key(infra_signature, selected_filters, apt_data):
+    # 상세 목록/지도 캐시 키: 인프라 서명 x 필터 x 선택 매물 (업로드가 달라도 같은 매물이면 공유)
+    return (infra_signature, tuple(selected_filters.items()), float(apt_data['latitude']), float(apt_data['longitude']),
+            str(apt_data['자치구명']), str(apt_data['건물명']))
+
+def cached_compute(cache, key, compute, rec=None):
+    # 결과 캐시 조회/계산. rec(단계 기록)이 있으면 적중 여부를 남김
+    ran = []
+    value = cache.get_or_compute(key, lambda: ran.append(True) or compute())
+    if rec is not None:
+        rec['cache'] = 'miss' if ran else 'hit'
+    return value
+
+@st.cache_resource
+def get_prerender_pool():
+    # 상세 지도 미리 그리기 전용 스레드 1개 (사용자 질의 작업 풀과 분리)
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix='map-prerender')
+
+def result_apt_pos(df_map, i):
+    # 결과 i 번째 행의 업로드 내 위치 (이웃 그래프 슬라이스용. 결과 인덱스 = 업로드 내 위치)
+    return int(df_map.index[i])
+
+def _prerender_done(future):
+    # 백그라운드 작업이라 예외가 화면에 드러나지 않음 -> 로그로 남김
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("detail map prerender failed: %r", future.exception())
+
+def prerender_detail_maps(cache, infra, infra_signature, selected_filters, df_map, top_n=PRERENDER_TOP_N, profiles=None,
+                          stop=None):
+    # 요약 화면이 보이는 동안 순위 상위 매물의 상세 목록 + 지도 HTML 을 백그라운드에서 결과 캐시에 채움.
+    # stop 이벤트가 설정되면 다음 매물부터 건너뜀
+    targets = [(apartment_detail_data(row), result_apt_pos(df_map, i))
+               for i, (_, row) in enumerate(df_map.head(top_n).iterrows())]
+    def work():
+        for apt_data, apt_pos in targets:
+            if stop is not None and stop.is_set():
+                return
+            key = detail_cache_key(infra_signature, selected_filters, apt_data)
+            df_details = cache.get_or_compute(('details',) + key,
+                                              lambda: get_apartment_infrastructure_details(apt_data, infra, selected_filters,
+                                                                                           profiles, apt_pos))
+            cache.get_or_compute(('detail_map',) + key, lambda: render_detailed_map(apt_data, df_details))
+    future = get_prerender_pool().submit(work)
+    future.add_done_callback(_prerender_done)
+    return future
+
+def cancel_stale_prerender(query_key):
+    # 세션당 마지막 미리 그리기만 유지. 질의가 바뀌면 대기 중이면 취소, 실행 중이면 다음 매물에서 멈춤
+    prev = st.session_state.get('_prerender')
+    if prev is not None and prev[0] != query_key:
+        _, future, stop = prev
+        stop.set()
+        future.cancel()
+        del st.session_state['_prerender']
 
 # ====================================================================
 # --- 3. Streamlit 애플리케이션 메인 함수 ---
 # ====================================================================
 
+SUMMARY_OPTION = '--- 전체 요약 보기 ---'
+RESULT_LIMIT_OPTIONS = [0, 100, 500, 1000, 5000]   # 0 = 전체
+RESULT_PAGE_SIZE = 100
+MAX_SELECT_OPTIONS = 200                             # 매물 선택 목록에 한 번에 올리는 최대 개수
+
+def apartment_options(df_map, query, current=None):
+    # 검색어로 거른 매물 이름 중 순위 상위 MAX_SELECT_OPTIONS 개만 선택 목록으로 (전체 목록을 보내지 않음)
+    names = df_map['display_name']
+    if query:
+        names = names[names.str.contains(query, case=False, regex=False, na=False)]
+    options = names.head(MAX_SELECT_OPTIONS).tolist()
+    # 이미 선택한 매물은 검색어/순위가 바뀌어도 목록에 남겨 상세 화면이 풀리지 않도록
+    if current and current != SUMMARY_OPTION and current not in options and (df_map['display_name'] == current).any():
+        options.insert(0, current)
+    return [SUMMARY_OPTION] + options, len(names)
+
+def show_diagnostics(profile):
+    # 사이드바 진단 패널: 인프라 로드 결과(debug_info) + 이번 재실행의 단계별 시간/캐시 적중
+    with profile.panel.container():
+        with st.expander("🩺 진단 정보", expanded=True):
+            for line in profile.debug_info:
+                st.caption(line)
+            if profile.stages:
+                df_stages = pd.DataFrame(profile.stages)
+                cols = [c for c in ['stage', 'ms', 'rows', 'out_rows', 'cache', 'cache_overhead_ms', 'compute_ms'] if c in df_stages.columns]
+                st.dataframe(df_stages[cols], hide_index=True, use_container_width=True)
+            cache_stats = get_result_cache().stats()
+            st.caption(f"결과 캐시: {cache_stats['entries']}개 · {cache_stats['mb']}/{cache_stats['budget_mb']} MB · "
+                       f"적중 {cache_stats['hits']} / 미스 {cache_stats['misses']} / 제거 {cache_stats['evictions']} / 초과 {cache_stats['oversized']}")
+            query_stats = get_query_service().stats()
+            st.caption(f"질의 서비스: 진행 {query_stats['inflight']} (일반 {query_stats['light']} / 대용량 {query_stats['heavy']}) · "
+                       f"요청 {query_stats['submitted']} / 합침 {query_stats['coalesced']} / 거절 {query_stats['rejected']}")
+            if profile.warmup is not None:
+                state = (f"{profile.warmup.total_ms:.0f} ms" if profile.warmup.ready else
+                         f"실패 - {profile.warmup.error}" if profile.warmup.error else "진행 중")
+                st.caption(f"기동 워밍업 ({state}): {profile.warmup.summary()}")
+            st.caption(f"재실행 전체: {profile.total_ms:.0f} ms · run_id {profile.run_id}")
+
 def main():
+    ctx = get_script_run_ctx()
+    profile = profiling.start_run(ctx.session_id if ctx is not None else None)
+    profile.warmup = get_warmup(infra_data.source_signature())
+    try:
+        render_dashboard(profile)
+    finally:
+        profile.finish()
+        if profile.panel is not None:
+            show_diagnostics(profile)
+
+def render_dashboard(profile):
     st.set_page_config(layout="wide")
     
     # CSS 스타일링
@@ -277,7 +470,11 @@ def main():
     st.title("🏡 인프라 접근성 분석 대시보드")
     st.markdown("---")
 
-    df_infra, debug_info = load_all_infrastructure_data()
+    infra_signature = infra_data.source_signature()
+    with profiling.cached_stage('get_infra_store') as rec:
+        infra = get_infra_store(infra_signature)
+        rec['out_rows'] = len(infra)
+    profile.debug_info = infra.debug_info
     
     # [사이드바]
     st.sidebar.markdown("### 🏢 아파트 데이터 업로드")
@@ -285,16 +482,20 @@ def main():
         uploaded_file = st.file_uploader("", type="csv", label_visibility="hidden")
     
     df_apt = None
+    apt_fingerprint = None
     if uploaded_file is not None:
         try:
-            df_apt_temp = pd.read_csv(uploaded_file)
-            # [수정] 조인 Key로 사용할 '주소' 컬럼 필수 확인
-            required_cols = ['자치구명', '주소', '건물명', 'lat', 'lng']
-            if not all(col in df_apt_temp.columns for col in required_cols):
-                st.sidebar.error(f"❌ 필수 컬럼 누락! CSV 파일에 다음 컬럼이 모두 있어야 합니다:\n{', '.join(required_cols)}")
-            else:
-                st.sidebar.success(f"✅ **{uploaded_file.name}** 데이터 로드 완료.")
-                df_apt = df_apt_temp.copy()
+            apt_fingerprint = upload_fingerprint(uploaded_file)
+            with profiling.stage('read_upload_csv') as rec:
+                df_apt, ingest_report = load_uploaded_apartments(uploaded_file, apt_fingerprint)
+                rec['out_rows'] = len(df_apt)
+            st.sidebar.success(f"✅ **{uploaded_file.name}** 데이터 로드 완료.")
+            if ingest_report['rows_dropped']:
+                st.sidebar.caption(f"⚠️ 좌표가 없거나 잘못된 {ingest_report['rows_dropped']:,}행은 제외했습니다.")
+        except MissingColumnsError as e:
+            # [수정] 조인 Key로 사용할 '주소' 컬럼 필수 확인 (헤더만 읽고 즉시 판단)
+            st.sidebar.error(str(e))
+            df_apt = None
         except Exception as e:
             st.sidebar.error(f"❌ 파일을 읽는 중 오류가 발생했습니다: {e}")
             df_apt = None
@@ -306,7 +507,7 @@ def main():
     # [사이드바] 인프라 필터 설정
     st.sidebar.markdown("### 🎛️ 인프라 필터 설정")
     selected_filters = {}
-    max_radius = 5000
+    max_radius = PROFILE_MAX_RADIUS_M
 
     with st.sidebar.container(border=True):
         # 학교
@@ -336,6 +537,22 @@ def main():
         if st.checkbox("문화시설", value=False): selected_filters['문화시설'] = st.slider("문화시설 (m)", 100, max_radius, 2000, 50, key="s_art")
         st.markdown("<br>", unsafe_allow_html=True)
 
+    st.sidebar.markdown("### 🏆 결과 표시")
+    with st.sidebar.container(border=True):
+        top_k = st.selectbox("순위 범위", RESULT_LIMIT_OPTIONS, index=0, key="result_limit",
+                             format_func=lambda k: "전체" if k == 0 else f"총 개수 상위 {k:,}개",
+                             help="많은 매물이 조건을 통과할 때 상위 매물만 골라 표·지도에 표시합니다.")
+        access_raster = get_access_raster(infra_signature)
+        fast_mode = st.checkbox("⚡ 빠른 근사 모드", value=False, key="fast_mode", disabled=access_raster is None,
+                                help="미리 계산한 접근성 래스터로 필터링합니다. 통과 여부는 정확하고(경계 근처만 정밀 계산), "
+                                     "반경 내 개수는 근사치입니다." if access_raster is not None else
+                                     "접근성 래스터가 없습니다. `python access_raster.py build` 로 먼저 생성하세요.")
+        # 비활성 체크박스도 세션에 남은 값을 반환 -> 래스터가 없으면 끔
+        fast_mode = fast_mode and access_raster is not None
+
+    if st.sidebar.checkbox("🩺 진단 정보 표시", value=False, key="show_diagnostics"):
+        profile.panel = st.sidebar.empty()
+
     if df_apt is None:
         st.info("👋 **환영합니다!** 분석을 시작하려면 **왼쪽 사이드바**에서 아파트 데이터 파일(CSV)을 업로드해주세요.")
         return
@@ -358,7 +575,31 @@ def main():
     # ---------------------------------------------------------
     # 필터링 실행
     # ---------------------------------------------------------
-    df_filtered = filter_apartments(df_apt, df_infra, selected_filters)
+    with profiling.stage('spatial_index'):
+        spatial_index = infra.spatial_index()
+    with profiling.cached_stage('get_distance_profiles', rows=len(df_apt)):
+        profiles = get_distance_profiles(apt_fingerprint, infra_signature, df_apt)
+    # 같은 업로드 x 같은 필터 질의는 세션이 달라도 한 번만 계산 (질의 서비스 작업 풀에서 실행)
+    query_key = (apt_fingerprint, infra_signature, tuple(selected_filters.items()), top_k, fast_mode)
+    cancel_stale_prerender(query_key)
+    with profiling.stage('filter_apartments', rows=len(df_apt)) as rec:
+        result_cache = get_result_cache()
+        try:
+            df_filtered, rec['coalesced'] = run_query(
+                ('filter',) + query_key,
+                lambda: filter_apartments(df_apt, infra, selected_filters, spatial_index, profiles,
+                                          cache_key=(apt_fingerprint, infra_signature), top_k=top_k or None,
+                                          cache=result_cache, raster=access_raster if fast_mode else None),
+                cost=len(df_apt) * len(selected_filters))
+        except QueryRejected as e:
+            st.warning(str(e))
+            return
+        rec['out_rows'] = len(df_filtered)
+        rec['matched'] = df_filtered.attrs.get('matched', len(df_filtered))
+        if fast_mode:
+            rec['exact_checked'] = df_filtered.attrs.get('exact_checked')
+        if 'type_cache_hits' in df_filtered.attrs:
+            rec['type_cache_hits'] = f"{df_filtered.attrs['type_cache_hits']}/{len(selected_filters)}"
     
     if df_filtered.empty:
         st.warning("선택된 조건(거리/인프라 종류)에 해당하는 아파트가 없습니다.")
@@ -366,9 +607,12 @@ def main():
     
     # [수정] 지도 및 화면 표시용으로 이름 변경 (lat, lng -> latitude, longitude)
     df_map = df_filtered.rename(columns={'lat': 'latitude', 'lng': 'longitude'})
-    df_map['display_name'] = "[" + df_map['자치구명'] + "] " + df_map['건물명']
+    df_map['display_name'] = "[" + df_map['자치구명'].astype(str) + "] " + df_map['건물명']
     
-    apartment_names = ['--- 전체 요약 보기 ---'] + df_map['display_name'].tolist()
+    matched_count = df_filtered.attrs.get('matched', len(df_filtered))
+    # 필터링이 만든 아파트 -> 시설 이웃 그래프(유형별 프로파일)를 상세 목록·지도 마커가 그대로 슬라이스.
+    # 빠른 근사 모드는 그래프를 만들지 않으므로 기존 방식으로 계산
+    graph = None if fast_mode else profiles
     
     head_col1, head_col2 = st.columns(2)
     with head_col1: header_left_placeholder = st.empty()
@@ -379,22 +623,50 @@ def main():
     with body_col2:
         with st.container(border=True):
             st.markdown("##### 📍 매물 선택")
+            search_query = st.text_input("매물 검색", key='drill_down_query', placeholder="🔎 아파트명 / 자치구 검색", label_visibility='collapsed')
+            apartment_names, n_found = apartment_options(df_map, search_query.strip(), st.session_state.get('drill_down_select'))
             selected_name_display = st.selectbox("매물 선택", apartment_names, key='drill_down_select', label_visibility='collapsed')
+            if n_found > MAX_SELECT_OPTIONS:
+                st.caption(f"{n_found:,}개 중 순위 상위 {MAX_SELECT_OPTIONS}개만 표시합니다. 검색어로 좁혀 보세요.")
         summary_placeholder = st.empty()
         table_container = st.container(border=True)
 
-    if selected_name_display == '--- 전체 요약 보기 ---':
+    if selected_name_display == SUMMARY_OPTION:
         # [A] 전체 요약 모드
         with header_left_placeholder.container():
             with st.container(border=True):
-                st.markdown(f"#### ✅ 최종 검색 결과: 총 **{len(df_filtered)}** 개의 매물")
+                st.markdown(f"#### ✅ 최종 검색 결과: 총 **{matched_count}** 개의 매물")
+                if len(df_filtered) < matched_count:
+                    st.caption(f"총 개수 상위 {len(df_filtered):,}개만 표시합니다.")
+                if fast_mode:
+                    st.caption(f"⚡ 빠른 근사 모드: 반경 내 개수는 근사치입니다 (경계 ±{access_raster.bound_m:.0f}m 안의 "
+                               f"{df_filtered.attrs.get('exact_checked', 0):,}건은 정밀 계산).")
         
         with header_right_placeholder.container():
             with st.container(border=True):
                 st.markdown("#### 🏢 아파트 추천 목록")
         
         with body_col1:
-            create_folium_map(df_map, df_infra, selected_filters)
+            # 지도 HTML 은 결과(질의 키)별로 결과 캐시에 보관 -> 관련 없는 위젯 변경이나 요약 화면 복귀 시 재사용
+            with profiling.stage('create_folium_map', rows=len(df_map)) as rec:
+                map_key = ('map_html',) + query_key
+                map_html = result_cache.get(map_key)
+                rec['cache'] = 'hit' if map_html is not None else 'miss'
+                try:
+                    if map_html is None:
+                        map_html, rec['coalesced'] = run_query(
+                            ('map',) + query_key,
+                            lambda: result_cache.get_or_compute(
+                                map_key, lambda: render_folium_map(df_map, infra, selected_filters, raster=access_raster,
+                                                                   profiles=graph)),
+                            cost=len(df_map))
+                    show_map_html(map_html)
+                except QueryRejected as e:
+                    st.warning(str(e))
+            if '_prerender' not in st.session_state:
+                stop = threading.Event()
+                st.session_state['_prerender'] = (query_key, prerender_detail_maps(
+                    result_cache, infra, infra_signature, selected_filters, df_map, profiles=graph, stop=stop), stop)
             
         with table_container:
             st.markdown("##### 📋 아파트 상세 목록")
@@ -403,38 +675,60 @@ def main():
             display_cols = ['자치구명', '주소', '건물명'] + [f'{k}_카운트' for k in selected_filters.keys()]
             rename_map = {f'{k}_카운트': k for k in selected_filters.keys()}
             
+            # 한 페이지씩만 화면에 전달 (전체는 아래 다운로드로)
+            n_pages = max(1, -(-len(df_map) // RESULT_PAGE_SIZE))
+            if st.session_state.get('result_page', 1) > n_pages:
+                st.session_state['result_page'] = 1
+            page = 1
+            if n_pages > 1:
+                page = st.number_input(f"페이지 (1~{n_pages})", min_value=1, max_value=n_pages, step=1, key='result_page')
+            page_start = (page - 1) * RESULT_PAGE_SIZE
+            df_page = df_map.iloc[page_start:page_start + RESULT_PAGE_SIZE]
+
             # [수정] column_config를 사용하여 '주소', 'lat', 'lng' 등을 화면에서만 숨김
             st.dataframe(
-                df_map[display_cols].rename(columns=rename_map),
+                df_page[display_cols].rename(columns=rename_map),
                 use_container_width=True, 
                 hide_index=True,
                 column_config={
                     "주소": None,  # <--- 화면에서 숨김 (데이터는 존재함)
                 }
             )
-
-            # [추가] 다운로드 버튼: 화면엔 안 보였던 '주소'가 포함된 CSV를 내려받음
-            csv_data = df_map[display_cols].rename(columns=rename_map).to_csv(index=False).encode('utf-8-sig')
-            
-            st.download_button(
-                label="📥 리스트 다운로드 (주소 포함)",
-                data=csv_data,
-                file_name='filtered_apartments_result.csv',
-                mime='text/csv',
-                help="다운로드된 파일에는 분석용 조인을 위한 '주소' 컬럼이 포함되어 있습니다."
-            )
+            if n_pages > 1:
+                st.caption(f"{page_start + 1:,}~{min(page_start + RESULT_PAGE_SIZE, len(df_map)):,}번째 / 총 {len(df_map):,}개")
+
+            # [추가] 다운로드 버튼: 화면엔 안 보였던 '주소'가 포함된 파일을 내려받음
+            # 파일은 버튼을 눌렀을 때만 만들어짐 (재실행마다 직렬화하지 않음)
+            export_col1, export_col2 = st.columns([1, 1])
+            with export_col1:
+                export_fmt = st.selectbox("내보내기 형식", available_formats(), key='export_format',
+                                          format_func=lambda f: EXPORT_FORMATS[f][0], label_visibility='collapsed')
+            _, export_mime, export_ext = EXPORT_FORMATS[export_fmt]
+            export_fp = result_fingerprint(*query_key)
+            with export_col2:
+                st.download_button(
+                    label="📥 리스트 다운로드 (주소 포함)",
+                    data=export_data(export_fmt, export_fp, df_map, display_cols, rename_map,
+                                     selected_filters, infra, spatial_index),
+                    file_name=f'filtered_apartments_result{export_ext}',
+                    mime=export_mime,
+                    help="다운로드된 파일에는 분석용 조인을 위한 '주소' 컬럼이 포함되어 있습니다. "
+                         "상세 번들은 매물별 반경 내 시설 목록(거리 포함)입니다."
+                )
 
     else:
         # [B] 상세 분석 모드
-        selected_apt_row = df_map[df_map['display_name'] == selected_name_display].iloc[0]
+        selected_i = int(np.flatnonzero((df_map['display_name'] == selected_name_display).values)[0])
+        selected_apt_row = df_map.iloc[selected_i]
         
-        apt_data_for_detail = {
-            'latitude': selected_apt_row['latitude'], 
-            'longitude': selected_apt_row['longitude'], 
-            '건물명': selected_apt_row['건물명'],
-            '자치구명': selected_apt_row['자치구명']
-        }
-        df_details = get_apartment_infrastructure_details(apt_data_for_detail, df_infra, selected_filters)
+        apt_data_for_detail = apartment_detail_data(selected_apt_row)
+        # 상세 목록과 지도는 (인프라, 필터, 매물)별로 결과 캐시에 보관 (요약 화면에서 상위 매물은 미리 계산됨)
+        detail_key = detail_cache_key(infra_signature, selected_filters, apt_data_for_detail)
+        with profiling.stage('get_apartment_infrastructure_details') as rec:
+            df_details = cached_compute(result_cache, ('details',) + detail_key,
+                                        lambda: get_apartment_infrastructure_details(apt_data_for_detail, infra, selected_filters,
+                                                                                     graph, result_apt_pos(df_map, selected_i)), rec)
+            rec['out_rows'] = len(df_details)
         
         selected_apt_total_count = df_details.shape[0]
         
@@ -447,7 +741,10 @@ def main():
                 st.markdown(f"#### 🏢 {selected_name_display} 주변 인프라 목록")
         
         with body_col1:
-            create_detailed_map(apt_data_for_detail, df_details)
+            with profiling.stage('create_detailed_map', rows=len(df_details)) as rec:
+                detail_html = cached_compute(result_cache, ('detail_map',) + detail_key,
+                                             lambda: render_detailed_map(apt_data_for_detail, df_details), rec)
+                show_map_html(detail_html)
             
         with summary_placeholder.container():
             with st.container(border=True):
@@ -0,0 +1,93 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+# ====================================================================
+# --- 업로드 아파트 CSV 수집 (헤더 선검사 + 스키마 지정 청크 파싱) ---
+# ====================================================================
+
+REQUIRED_COLUMNS = ['자치구명', '주소', '건물명', 'lat', 'lng']
+ENCODINGS = ['utf-8-sig', 'cp949', 'euc-kr']
+SNIFF_BYTES = 64 * 1024
+DEFAULT_CHUNKSIZE = 100_000
+
+# 좌표 외 컬럼의 명시적 dtype (자치구명은 청크별 category 로 변환 후 합침)
+TEXT_COLUMNS = ['주소', '건물명']
+
+
+class MissingColumnsError(ValueError):
+    def __init__(self, missing, required):
+        self.missing = missing
+        self.required = required
+        super().__init__(f"❌ 필수 컬럼 누락! CSV 파일에 다음 컬럼이 모두 있어야 합니다:\n{', '.join(required)}")
+
+
+def sniff_header(file, required_cols=REQUIRED_COLUMNS):
+    # 파일 앞부분만 읽어 인코딩과 헤더를 확인. 필수 컬럼이 없으면 본문을 파싱하기 전에 실패
+    file.seek(0)
+    head = file.read(SNIFF_BYTES)
+    file.seek(0)
+    if len(head) == SNIFF_BYTES and b'\n' in head:
+        head = head[:head.rfind(b'\n') + 1]   # 잘린 멀티바이트 문자로 인한 오판 방지
+
+    for enc in ENCODINGS:
+        try:
+            text = head.decode(enc)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        raise ValueError("❌ CSV 인코딩을 인식할 수 없습니다 (utf-8 / cp949 / euc-kr).")
+
+    columns = list(pd.read_csv(io.StringIO(text), nrows=0).columns)
+    missing = [c for c in required_cols if c not in columns]
+    if missing:
+        raise MissingColumnsError(missing, required_cols)
+    return enc, columns
+
+
+def _valid_coordinates(lat, lng):
+    return (np.isfinite(lat) & np.isfinite(lng)
+            & (np.abs(lat) <= 90) & (np.abs(lng) <= 180)
+            & ~((lat == 0) & (lng == 0)))
+
+
+def read_apartment_csv(file, required_cols=REQUIRED_COLUMNS, chunksize=DEFAULT_CHUNKSIZE, progress_callback=None):
+    # 반환: (DataFrame, {'encoding', 'rows_read', 'rows_dropped'})
+    # progress_callback(진행률 0~1, 읽은 행 수) 는 청크마다 호출
+    encoding, _ = sniff_header(file, required_cols)
+    total_bytes = getattr(file, 'size', None)
+    if total_bytes is None:
+        total_bytes = file.seek(0, io.SEEK_END)
+        file.seek(0)
+
+    dtype = {c: str for c in TEXT_COLUMNS if c in required_cols}
+    if '자치구명' in required_cols:
+        dtype['자치구명'] = str
+    chunks = []
+    rows_read = rows_dropped = 0
+    reader = pd.read_csv(file, usecols=required_cols, dtype=dtype, encoding=encoding, chunksize=chunksize)
+    for chunk in reader:
+        rows_read += len(chunk)
+        lat = pd.to_numeric(chunk['lat'], errors='coerce').to_numpy(dtype=np.float64)
+        lng = pd.to_numeric(chunk['lng'], errors='coerce').to_numpy(dtype=np.float64)
+        valid = _valid_coordinates(lat, lng)
+        rows_dropped += int((~valid).sum())
+        chunk = chunk[valid]
+        chunk = chunk.assign(lat=lat[valid], lng=lng[valid])
+        if '자치구명' in chunk.columns:
+            chunk['자치구명'] = chunk['자치구명'].fillna('').astype('category')
+        chunks.append(chunk)
+        if progress_callback is not None and total_bytes:
+            progress_callback(min(1.0, file.tell() / total_bytes), rows_read)
+
+    if not chunks:
+        return pd.DataFrame(columns=required_cols), {'encoding': encoding, 'rows_read': 0, 'rows_dropped': 0}
+
+    df_apt = pd.concat(chunks, ignore_index=True)
+    if '자치구명' in df_apt.columns and not isinstance(df_apt['자치구명'].dtype, pd.CategoricalDtype):
+        # 청크마다 범주가 달라 object 로 풀린 경우 다시 category 로
+        df_apt['자치구명'] = pd.api.types.union_categoricals([c['자치구명'] for c in chunks])
+    df_apt = df_apt[required_cols]
+    return df_apt, {'encoding': encoding, 'rows_read': rows_read, 'rows_dropped': rows_dropped}
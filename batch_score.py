@@ -0,0 +1,204 @@
+import os
+import sys
+import time
+import argparse
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import infra_data
+from spatial_index import build_spatial_index, filter_with_index
+
+# ====================================================================
+# --- 대용량 아파트 파일 일괄 채점 (Streamlit 없이 실행) ---
+# ====================================================================
+# 예) python batch_score.py listings.csv result.parquet -f 초등학교=500 -f 지하철역=1000 -w 8
+#
+# filter_apartments 와 같은 의미(유형별 반경, AND 조건, `_카운트` 컬럼)로 입력을 청크 단위로 읽어
+# 워커 프로세스에 나눠 주고, 결과는 입력 순서대로 CSV/Parquet 에 바로 기록한다.
+# 전체 정렬은 하지 않으므로 메모리는 (워커 수 x 2) 개 청크로 제한된다.
+# lat/lng 외 컬럼은 문자열 그대로 읽는다 (청크마다 추론된 dtype 이 달라 Parquet 스키마가 깨지지 않도록).
+
+DEFAULT_CHUNKSIZE = 200_000
+REQUIRED_COLUMNS = ['lat', 'lng']
+
+_WORKER_INDEX = None   # 워커 프로세스의 유형별 공간 인덱스 (fork 시 부모 것을 읽기 전용으로 공유)
+
+
+def _init_worker():
+    # spawn 방식(Windows/macOS)에서는 스냅샷 파일을 매핑해 인덱스를 새로 만든다
+    global _WORKER_INDEX
+    if _WORKER_INDEX is None:
+        df_infra, _ = infra_data.load_all_infrastructure_data()
+        _WORKER_INDEX = build_spatial_index(df_infra)
+
+
+def _score_chunk(df_chunk, selected_filters):
+    for col in REQUIRED_COLUMNS:
+        df_chunk[col] = pd.to_numeric(df_chunk[col], errors='coerce')
+    return len(df_chunk), filter_with_index(df_chunk, _WORKER_INDEX, selected_filters, sort_by_total=False)
+
+
+class _ResultWriter:
+    # 청크 결과를 순서대로 이어 쓰는 CSV / Parquet 기록기
+    def __init__(self, output_path, fmt):
+        self.output_path = output_path
+        self.fmt = fmt
+        self._parquet = None
+        self._schema = None
+        self._wrote_header = False
+        self.discard()
+
+    def discard(self):
+        # 이전 실행 결과 / 실패한 실행의 일부만 쓴 파일 제거
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
+
+    def write(self, df):
+        if df.empty:
+            return
+        self._write(df)
+
+    def write_empty(self, df_empty):
+        # 통과한 행이 하나도 없을 때 헤더(Parquet 는 스키마)만 있는 결과 파일을 남김
+        if not self._wrote_header and self._parquet is None:
+            self._write(df_empty)
+
+    def _write(self, df):
+        if self.fmt == 'csv':
+            df.to_csv(self.output_path, mode='a', index=False, header=not self._wrote_header,
+                      encoding='utf-8-sig' if not self._wrote_header else 'utf-8')
+            self._wrote_header = True
+            return
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._parquet is None:
+            self._schema = table.schema
+            self._parquet = pq.ParquetWriter(self.output_path, self._schema)
+        else:
+            table = table.cast(self._schema)   # 값이 모두 비어 있는 청크의 컬럼 타입을 첫 청크 스키마에 맞춤
+        self._parquet.write_table(table)
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def _check_columns(input_path, encoding):
+    # 반환: 청크를 읽을 dtype (lat/lng 외 모두 문자열)과 같은 dtype 의 빈 DataFrame
+    header = pd.read_csv(input_path, nrows=0, encoding=encoding).columns
+    missing = [c for c in REQUIRED_COLUMNS if c not in header]
+    if missing:
+        raise ValueError(f"❌ 필수 컬럼 누락: {', '.join(missing)}")
+    dtypes = {c: str for c in header if c not in REQUIRED_COLUMNS}
+    df_template = pd.DataFrame({c: pd.Series(dtype=dtypes.get(c, 'float64')) for c in header})
+    return dtypes, df_template
+
+
+def _check_filters(selected_filters, spatial_index):
+    unknown = [t for t in selected_filters if t not in spatial_index]
+    if unknown:
+        raise ValueError(f"❌ 알 수 없는 인프라 유형: {', '.join(unknown)} "
+                         f"(사용 가능: {', '.join(sorted(spatial_index))})")
+
+
+def _empty_result(df_template, selected_filters):
+    # filter_with_index 결과와 같은 컬럼 구성의 빈 DataFrame (원본 컬럼 + `_카운트` 컬럼 + 자치구명)
+    df_empty = df_template.copy()
+    for infra_type in selected_filters:
+        df_empty[f'{infra_type}_카운트'] = pd.Series(dtype='int64')
+    if '자치구명' not in df_empty.columns:
+        df_empty['자치구명'] = pd.Series(dtype=str)
+    return df_empty
+
+
+def score_file(input_path, output_path, selected_filters, workers=None, chunksize=DEFAULT_CHUNKSIZE,
+               fmt=None, encoding='utf-8'):
+    # 라이브러리 진입점. 반환: {'rows': 입력 행 수, 'matched': 통과 행 수, 'seconds': 소요 시간}
+    global _WORKER_INDEX
+    if not selected_filters:
+        raise ValueError("❌ 필터(인프라 유형=반경)를 하나 이상 지정해야 합니다.")
+    if fmt is None:
+        fmt = 'parquet' if output_path.lower().endswith(('.parquet', '.pq')) else 'csv'
+    workers = workers or os.cpu_count() or 1
+    dtypes, df_template = _check_columns(input_path, encoding)
+
+    started = time.perf_counter()
+    # 부모에서 스냅샷을 갱신하고 인덱스를 만들어 두면 fork 된 워커는 그대로 공유
+    df_infra, _ = infra_data.load_all_infrastructure_data()
+    spatial_index = build_spatial_index(df_infra)
+    del df_infra
+    _check_filters(selected_filters, spatial_index)
+    _WORKER_INDEX = spatial_index
+
+    ctx = mp.get_context('fork') if 'fork' in mp.get_all_start_methods() else mp.get_context()
+    writer = _ResultWriter(output_path, fmt)
+    rows = matched = 0
+    pending = deque()
+    completed = False
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker) as pool:
+            def drain_one():
+                nonlocal rows, matched
+                n_rows, df_result = pending.popleft().result()
+                rows += n_rows
+                matched += len(df_result)
+                writer.write(df_result)
+
+            for df_chunk in pd.read_csv(input_path, chunksize=chunksize, encoding=encoding, dtype=dtypes):
+                pending.append(pool.submit(_score_chunk, df_chunk, selected_filters))
+                if len(pending) >= workers * 2:
+                    drain_one()
+            while pending:
+                drain_one()
+        if matched == 0:
+            writer.write_empty(_empty_result(df_template, selected_filters))
+        completed = True
+    finally:
+        writer.close()
+        if not completed:
+            writer.discard()
+        _WORKER_INDEX = None
+
+    return {'rows': rows, 'matched': matched, 'seconds': time.perf_counter() - started}
+
+
+def parse_filters(items):
+    # ['초등학교=500', '지하철역=1000'] -> {'초등학교': 500, '지하철역': 1000}
+    selected_filters = {}
+    for item in items:
+        name, sep, radius = item.partition('=')
+        if not sep:
+            raise argparse.ArgumentTypeError(f"필터 형식은 유형=반경(m) 입니다: {item}")
+        selected_filters[name.strip()] = float(radius) if '.' in radius else int(radius)
+    return selected_filters
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="아파트 CSV 인프라 접근성 일괄 채점")
+    parser.add_argument('input', help="아파트 CSV (lat, lng 컬럼 필수)")
+    parser.add_argument('output', help="결과 파일 (.csv 또는 .parquet)")
+    parser.add_argument('-f', '--filter', action='append', default=[], metavar='유형=반경',
+                        help="인프라 유형과 반경(m). 여러 번 지정하면 AND 조건")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="워커 프로세스 수 (기본: CPU 수)")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="청크당 행 수")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default=None, help="출력 형식 (기본: 확장자로 판단)")
+    parser.add_argument('--encoding', default='utf-8', help="입력 CSV 인코딩")
+    args = parser.parse_args(argv)
+
+    try:
+        result = score_file(args.input, args.output, parse_filters(args.filter), workers=args.workers,
+                            chunksize=args.chunksize, fmt=args.format, encoding=args.encoding)
+    except (ValueError, argparse.ArgumentTypeError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"✅ {result['rows']}건 중 {result['matched']}건 통과 ({result['seconds']:.1f}초) -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import infra_data
+from spatial_index import build_spatial_index, apartment_coordinates
+from infra_store import InfraStore
+from distance_profile import PROFILE_MAX_RADIUS_M, DistanceProfile, DistanceProfileSet, filter_with_profiles
+from benchmarks.synthetic import load_seed_infrastructure, make_apartments, make_infrastructure
+
+# ====================================================================
+# --- 단계별 성능 벤치마크 (Streamlit 서버 없이 실행) ---
+# ====================================================================
+# python -m benchmarks.run_benchmarks --quick --output bench.json
+# python -m benchmarks.run_benchmarks --output bench.json --save-baseline benchmarks/baseline.json   # 기준 리포트 저장
+# python -m benchmarks.run_benchmarks --output bench.json --baseline benchmarks/baseline.json        # 기준과 비교
+#
+# 각 단계는 repeat 회 실행해 최소 시간을 기록하고, tracemalloc 을 켠 별도 1회 실행으로
+# 최대 메모리(peak_mb)를 잰다. --baseline 과 비교해 tolerance 이상 느려지면 종료 코드 1.
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+QUICK_SIZES = [1_000, 10_000]
+
+# 사이드바 기본 반경 기준 필터 조합
+FILTER_COMBOS = [
+    {'초등학교': 500},
+    {'초등학교': 500, '버스정류장': 500},
+    {'지하철역': 1000, '대형마트': 2000, '공원': 1000},
+    {'대형병원': 1500, '일반병원': 1000, '중학교': 1000, '고등학교': 1500},
+    {'버스정류장': 500, '지하철역': 1000, '백화점': 3000, '문화시설': 2000},
+]
+# 슬라이더 이동 시나리오: 첫 유형 반경만 바꿔 다시 필터링
+SLIDER_STEP_M = 250
+
+
+def combo_label(selected_filters):
+    return ",".join(f"{k}={v}" for k, v in selected_filters.items())
+
+
+def measure(fn, repeat):
+    # (최소 시간, 전체 시간 목록, peak MB, 마지막 반환값)
+    times = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(times), times, peak / 1e6, result
+
+
+def _record(results, stage, rows, filters, measured, out_rows=None, **extra):
+    best, times, peak_mb, _ = measured
+    entry = {'stage': stage, 'rows': rows, 'filters': filters, 'seconds': best,
+             'seconds_all': times, 'peak_mb': round(peak_mb, 3)}
+    if out_rows is not None:
+        entry['out_rows'] = int(out_rows)
+    entry.update(extra)
+    results.append(entry)
+    print(f"{stage:<40} rows={rows:<9} {filters:<45} {best * 1000:10.1f} ms  peak {peak_mb:8.1f} MB", flush=True)
+
+
+def run_load_stages(results, repeat):
+    # 스냅샷 없이 CSV 파싱 / 스냅샷 매핑 두 경우를 임시 디렉터리에서 측정
+    original_dir = infra_data.SNAPSHOT_DIR
+    tmp_dir = tempfile.mkdtemp(prefix='infra_snapshot_bench_')
+    try:
+        infra_data.SNAPSHOT_DIR = tmp_dir
+        m = measure(lambda: infra_data.load_all_infrastructure_data(use_snapshot=False), repeat)
+        _record(results, 'load_all_infrastructure_data[csv]', 0, '', m, out_rows=len(m[3][0]))
+        infra_data.build_snapshot()
+        m = measure(lambda: infra_data.load_all_infrastructure_data(use_snapshot=True), repeat)
+        _record(results, 'load_all_infrastructure_data[snapshot]', 0, '', m, out_rows=len(m[3][0]))
+    finally:
+        infra_data.SNAPSHOT_DIR = original_dir
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def run(sizes, repeat, infra_scale, seed, profile_max_rows, map_max_rows, combos):
+    import app   # Streamlit 은 bare 모드로만 import (서버 실행 없음)
+
+    results = []
+    run_load_stages(results, repeat)
+
+    df_seed = load_seed_infrastructure()
+    df_infra = make_infrastructure(df_seed, infra_scale, seed)
+    m = measure(lambda: build_spatial_index(df_infra), repeat)
+    _record(results, 'build_spatial_index', 0, '', m, infra_rows=len(df_infra))
+    m = measure(lambda: InfraStore(df_infra), repeat)
+    _record(results, 'build_infra_store', 0, '', m, infra_rows=len(df_infra))
+    infra = m[3]
+    spatial_index = infra.spatial_index()
+    # 같은 시설에 대한 전 후보 haversine 인덱스 (평면 근사 + 경계 보정과 비교용)
+    haversine_index = build_spatial_index(df_infra, backend='haversine')
+
+    for n_rows in sizes:
+        df_apt = make_apartments(n_rows, df_seed, seed)
+        if n_rows <= profile_max_rows:
+            # 시설이 가장 많은 유형의 최대 반경 프로파일 생성을 백엔드별로 (생성은 적중마다 거리가 필요)
+            apt_lat, apt_lng = apartment_coordinates(df_apt)
+            busiest = max(spatial_index, key=lambda t: len(spatial_index[t]))
+            for stage, index in (('build_distance_profile', spatial_index),
+                                 ('build_distance_profile[haversine]', haversine_index)):
+                m = measure(lambda: DistanceProfile.from_index(index[busiest], apt_lat, apt_lng, PROFILE_MAX_RADIUS_M),
+                            repeat)
+                _record(results, stage, n_rows, busiest, m, pairs=len(m[3].keys))
+        for selected_filters in combos:
+            label = combo_label(selected_filters)
+            m = measure(lambda: app.filter_apartments(df_apt, infra, selected_filters, spatial_index), repeat)
+            df_filtered = m[3]
+            _record(results, 'filter_apartments', n_rows, label, m, out_rows=len(df_filtered))
+            m = measure(lambda: app.filter_apartments(df_apt, infra, selected_filters, haversine_index), repeat)
+            _record(results, 'filter_apartments[haversine]', n_rows, label, m, out_rows=len(m[3]))
+
+            profiles = None
+            if n_rows <= profile_max_rows:
+                def build_and_filter():
+                    profiles = DistanceProfileSet(df_apt, spatial_index)
+                    filter_with_profiles(df_apt, profiles, selected_filters)
+                    return profiles
+                m = measure(build_and_filter, 1)
+                _record(results, 'distance_profile[build]', n_rows, label, m)
+                profiles = m[3]
+                moved = dict(selected_filters)
+                first = next(iter(moved))
+                moved[first] = moved[first] + SLIDER_STEP_M
+                m = measure(lambda: filter_with_profiles(df_apt, profiles, moved), repeat)
+                _record(results, 'filter_apartments[slider]', n_rows, label, m, out_rows=len(m[3]))
+
+            if df_filtered.empty:
+                continue
+            df_map = df_filtered.rename(columns={'lat': 'latitude', 'lng': 'longitude'})
+            top = df_map.iloc[0]
+            apt_data = {'latitude': top['latitude'], 'longitude': top['longitude'],
+                        '건물명': top['건물명'], '자치구명': top['자치구명']}
+            m = measure(lambda: app.get_apartment_infrastructure_details(apt_data, infra, selected_filters), repeat)
+            _record(results, 'get_apartment_infrastructure_details', n_rows, label, m, out_rows=len(m[3]))
+            if profiles is not None:
+                # 필터링이 만든 이웃 그래프를 슬라이스만 하는 경로
+                top_pos = app.result_apt_pos(df_map, 0)
+                m = measure(lambda: app.get_apartment_infrastructure_details(apt_data, infra, selected_filters,
+                                                                             profiles, top_pos), repeat)
+                _record(results, 'get_apartment_infrastructure_details[graph]', n_rows, label, m, out_rows=len(m[3]))
+
+            if len(df_map) <= map_max_rows:
+                # 앱의 create_folium_map 단계와 같은 작업 (지도 HTML 생성)
+                m = measure(lambda: app.render_folium_map(df_map, infra, selected_filters), repeat)
+                _record(results, 'create_folium_map', n_rows, label, m, html_mb=round(len(m[3]) / 1e6, 3))
+            if profiles is not None:
+                m = measure(lambda: app.find_relevant_infra(df_map, infra, selected_filters, profiles), repeat)
+                _record(results, 'find_relevant_infra[graph]', n_rows, label, m, out_rows=len(m[3]))
+
+    return results
+
+
+def compare(results, baseline, tolerance, min_seconds):
+    # (stage, rows, filters) 가 같은 항목끼리 비교. 아주 짧은 단계는 min_seconds 이하 차이 무시
+    base = {(r['stage'], r['rows'], r['filters']): r for r in baseline.get('results', [])}
+    regressions = []
+    for r in results:
+        b = base.get((r['stage'], r['rows'], r['filters']))
+        if b is None:
+            continue
+        ratio = r['seconds'] / b['seconds'] if b['seconds'] > 0 else float('inf')
+        if ratio > 1 + tolerance and r['seconds'] - b['seconds'] > min_seconds:
+            regressions.append({'stage': r['stage'], 'rows': r['rows'], 'filters': r['filters'],
+                                'baseline_seconds': b['seconds'], 'seconds': r['seconds'], 'ratio': round(ratio, 3)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="인프라 분석 단계별 벤치마크")
+    parser.add_argument('--sizes', default=None, help="아파트 행 수 목록 (예: 1000,10000)")
+    parser.add_argument('--quick', action='store_true', help=f"빠른 실행: {QUICK_SIZES} 행, 2회 반복")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--infra-scale', type=float, default=1.0, help="인프라 밀도 배율 (1.0 = 번들 데이터)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--profile-max-rows', type=int, default=20_000, help="거리 프로파일 측정 최대 행 수")
+    parser.add_argument('--map-max-rows', type=int, default=20_000, help="지도 렌더링 측정 최대 결과 행 수")
+    parser.add_argument('--output', default='bench_output.json')
+    parser.add_argument('--baseline', default=None, help="비교할 기준 리포트 (JSON)")
+    parser.add_argument('--save-baseline', default=None, help="이번 결과를 기준 리포트로 저장할 경로")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="허용 지연 비율 (0.25 = 25%%)")
+    parser.add_argument('--min-seconds', type=float, default=0.005)
+    args = parser.parse_args(argv)
+
+    if args.sizes:
+        sizes = [int(s) for s in args.sizes.split(',')]
+    else:
+        sizes = QUICK_SIZES if args.quick else DEFAULT_SIZES
+    repeat = 2 if args.quick and args.repeat == 3 else args.repeat
+
+    results = run(sizes, repeat, args.infra_scale, args.seed, args.profile_max_rows, args.map_max_rows, FILTER_COMBOS)
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'sizes': sizes,
+            'repeat': repeat,
+            'infra_scale': args.infra_scale,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        report['regressions'] = compare(results, baseline, args.tolerance, args.min_seconds)
+        for r in report['regressions']:
+            print(f"❌ 성능 저하: {r['stage']} rows={r['rows']} {r['filters']} "
+                  f"{r['baseline_seconds'] * 1000:.1f} -> {r['seconds'] * 1000:.1f} ms (x{r['ratio']})")
+        if report['regressions']:
+            exit_code = 1
+        else:
+            print("✅ 기준 대비 성능 저하 없음")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
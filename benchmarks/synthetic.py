@@ -0,0 +1,81 @@
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import infra_data
+from spatial_index import EARTH_RADIUS_M
+
+# ====================================================================
+# --- 벤치마크용 합성 데이터 생성기 (번들 CSV 를 시드로 사용) ---
+# ====================================================================
+# 아파트: 버스정류장 위치(= 실제 주거/생활권 밀도)를 시드로 뽑고 가우시안 지터를 더함
+# 인프라: 유형별로 번들 시설을 복원추출 + 지터 (scale=2 면 서울 실제 밀도의 2배)
+
+SEOUL_GU = ['종로구', '중구', '용산구', '성동구', '광진구', '동대문구', '중랑구', '성북구', '강북구', '도봉구',
+            '노원구', '은평구', '서대문구', '마포구', '양천구', '강서구', '구로구', '금천구', '영등포구', '동작구',
+            '관악구', '서초구', '강남구', '송파구', '강동구']
+APT_JITTER_M = 250.0
+INFRA_JITTER_M = 100.0
+
+
+def _jitter(lat, lng, sigma_m, rng):
+    dlat = np.degrees(rng.normal(0.0, sigma_m, len(lat)) / EARTH_RADIUS_M)
+    dlng = np.degrees(rng.normal(0.0, sigma_m, len(lng)) / EARTH_RADIUS_M) / np.cos(np.radians(lat))
+    return lat + dlat, lng + dlng
+
+
+def load_seed_infrastructure():
+    df_infra, _ = infra_data.load_all_infrastructure_data()
+    return df_infra.dropna(subset=['lat', 'lng']).reset_index(drop=True)
+
+
+def make_apartments(n_rows, df_seed, seed=0):
+    rng = np.random.default_rng(seed)
+    anchors = df_seed[df_seed['type'] == '버스정류장']
+    if anchors.empty:
+        anchors = df_seed
+    pick = rng.integers(0, len(anchors), n_rows)
+    lat, lng = _jitter(anchors['lat'].values[pick], anchors['lng'].values[pick], APT_JITTER_M, rng)
+    ids = np.arange(n_rows)
+    gu = np.asarray(SEOUL_GU, dtype=object)[rng.integers(0, len(SEOUL_GU), n_rows)]
+    return pd.DataFrame({
+        '자치구명': gu,
+        '주소': pd.Series(ids).map('서울특별시 합성로 {}'.format).values,
+        '건물명': pd.Series(ids).map('합성아파트{}'.format).values,
+        'lat': lat,
+        'lng': lng,
+        '세대수': rng.integers(30, 3000, n_rows),
+    })
+
+
+def make_infrastructure(df_seed, scale=1.0, seed=0):
+    # scale=1.0 이면 번들 데이터 그대로
+    if scale == 1.0:
+        return df_seed.copy()
+    rng = np.random.default_rng(seed)
+    parts = []
+    for infra_type, group in df_seed.groupby('type', sort=False):
+        n = max(1, int(round(len(group) * scale)))
+        pick = rng.integers(0, len(group), n)
+        lat, lng = _jitter(group['lat'].values[pick], group['lng'].values[pick], INFRA_JITTER_M, rng)
+        parts.append(pd.DataFrame({
+            'type': infra_type,
+            'infra_name': group['infra_name'].values[pick],
+            'lat': lat,
+            'lng': lng,
+        }))
+    return pd.concat(parts, ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="합성 아파트 CSV 생성")
+    parser.add_argument('rows', type=int)
+    parser.add_argument('output')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    make_apartments(args.rows, load_seed_infrastructure(), args.seed).to_csv(args.output, index=False, encoding='utf-8-sig')
+    print(f"✅ {args.rows}행 -> {args.output}")
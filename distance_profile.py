@@ -0,0 +1,266 @@
+import os
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+from spatial_index import apartment_coordinates, assemble_filtered
+
+# ====================================================================
+# --- 아파트별 정렬 거리 프로파일 (슬라이더 변경 시 거리 재계산 없이 재필터링) ---
+# ====================================================================
+
+PROFILE_MAX_RADIUS_M = 5000   # 사이드바 슬라이더 상한과 동일
+# 유형별 프로파일 하나를 만드는 동안의 최대 메모리. 넘는 유형은 프로파일 없이 공간 인덱스로 직접 질의
+PROFILE_BUDGET_MB = int(os.environ.get('INFRA_PROFILE_BUDGET_MB', '256'))
+# 생성 시 한 번에 반경 질의하는 아파트 수 (작업 배열이 묶음당 쌍 수에 비례하므로 일반 질의보다 작게)
+PROFILE_BUILD_CHUNK = 256
+# 묶음 하나를 처리하는 동안 쌍 하나당 작업 메모리 (후보 펼치기 + 정렬 + 키 변환, tracemalloc 실측 기준 여유 포함)
+BUILD_BYTES_PER_PAIR = 160
+BUILD_OVERHEAD_BYTES = 1024 * 1024
+# 크기 추정에 쓰는 아파트 표본 수 (이보다 적으면 전체로 정확히 계산)
+PROFILE_SAMPLE_SIZE = 2000
+
+logger = logging.getLogger(__name__)
+
+
+class DistanceProfile:
+    # 한 시설 유형에 대해, 아파트별로 max_radius 이내 시설까지의 거리를 오름차순으로 저장.
+    # 키 = (아파트 위치 << 32) | float32 거리 비트 (음수가 아닌 float32 는 비트 순서 = 값 순서)
+    # 이므로 키 배열 전체가 정렬되어 있고, 반경 r 의 개수는 searchsorted 한 번으로 구한다.
+    # 거리는 float32 로 보관하므로 5km 에서 0.5mm 이하의 반올림만 생긴다.
+    # fac[i] 는 keys[i] 의 시설 위치(infra.of_type(유형) 기준) -> offsets/fac/거리가 아파트 -> 시설
+    # 이웃 그래프(CSR)가 되어, 개수·상세 목록·지도 마커가 모두 거리 재계산 없이 이 배열의 슬라이스로 나온다.
+    def __init__(self, n_apt, keys, max_radius_m, fac=None):
+        self.n_apt = n_apt
+        self.keys = keys
+        self.fac = fac if fac is not None else np.empty(0, np.int32)
+        self.max_radius_m = max_radius_m
+        self.offsets = np.searchsorted(keys, np.arange(n_apt + 1, dtype=np.int64) << 32)
+
+    @classmethod
+    def from_index(cls, index, apt_lat, apt_lng, max_radius_m=PROFILE_MAX_RADIUS_M, capacity=0):
+        # 반경 질의 한 번으로 키와 시설 위치를 함께 생성 (질의 결과가 이미 (아파트, 거리) 순).
+        # 작은 아파트 묶음씩 질의해 예상 쌍 수(capacity)로 미리 할당한 배열에 바로 기록 (모자라면 1.25배씩 늘림)
+        keys = np.empty(capacity, np.int64)
+        fac = np.empty(capacity, np.int32)
+        n = 0
+        for apt_idx, hit, dist in index.query_radius_chunks(apt_lat, apt_lng, max_radius_m, PROFILE_BUILD_CHUNK):
+            end = n + len(apt_idx)
+            if end > len(keys):
+                size = max(end, int(len(keys) * 1.25))
+                keys.resize(size, refcheck=False)
+                fac.resize(size, refcheck=False)
+            keys[n:end] = dist.astype(np.float32).view(np.uint32)
+            keys[n:end] |= apt_idx.astype(np.int64) << 32
+            fac[n:end] = hit
+            n = end
+        if n < len(keys):
+            keys.resize(n, refcheck=False)
+            fac.resize(n, refcheck=False)
+        return cls(len(apt_lat), keys, max_radius_m, fac)
+
+    def _ends(self, radius_m, apt_pos):
+        # 아파트별 반경(경계 포함) 구간의 끝 위치
+        if radius_m > self.max_radius_m:
+            raise ValueError(f"반경 {radius_m}m 가 프로파일 상한 {self.max_radius_m}m 를 넘습니다.")
+        r_bits = np.int64(np.array(radius_m, dtype=np.float32).view(np.uint32))
+        return np.searchsorted(self.keys, (np.asarray(apt_pos, dtype=np.int64) << 32) | r_bits, side='right')
+
+    def counts(self, radius_m, apt_pos=None):
+        # 아파트별 반경 내 시설 수 (경계 포함)
+        if apt_pos is None:
+            apt_pos = np.arange(self.n_apt, dtype=np.int64)
+        return self._ends(radius_m, apt_pos) - self.offsets[apt_pos]
+
+    def neighbors(self, radius_m, apt_pos):
+        # 아파트 하나의 반경 내 (시설 위치, 거리) - 거리 오름차순
+        begin, end = self.offsets[apt_pos], int(self._ends(radius_m, apt_pos))
+        return self.fac[begin:end], (self.keys[begin:end] & 0xFFFFFFFF).astype(np.uint32).view(np.float32)
+
+    def facilities_within(self, radius_m, apt_pos):
+        # 아파트 목록 중 하나라도 반경 안에 두고 있는 시설 위치 (오름차순, 중복 없음)
+        apt_pos = np.asarray(apt_pos, dtype=np.int64)
+        begin = self.offsets[apt_pos]
+        lengths = self._ends(radius_m, apt_pos) - begin
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, np.int32)
+        rows = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(begin, lengths)
+        return np.unique(self.fac[rows])
+
+    @staticmethod
+    def nbytes_for(n_apt, pairs):
+        # 아파트 n_apt 개, (아파트, 시설) 쌍 pairs 개인 프로파일의 크기 (키 8 + 시설 위치 4 바이트/쌍 + 오프셋)
+        return pairs * 12 + (n_apt + 1) * 8
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.offsets.nbytes + self.fac.nbytes
+
+
+class DistanceProfileSet:
+    # 업로드된 아파트 집합 하나에 대한 유형별 프로파일 묶음.
+    # 생성 중 최대 메모리(완성된 프로파일 + 묶음 하나의 작업 배열)를 아파트 표본의 max_radius 개수 질의로 먼저
+    # 추정하고, budget_bytes 를 넘는 유형은 만들지 않고 계속 공간 인덱스로 직접 질의한다.
+    # executor 를 주면 처음 선택된 유형은 count_within 으로 바로 답하고 프로파일은 백그라운드에서 만든다.
+    # 이후 슬라이더 변경은 searchsorted 만 수행. executor 가 없으면(배치/벤치마크) 처음 질의 때 바로 만든다.
+    # cache(LRUResultCache)를 주면 유형별 프로파일을 key_prefix + ('profile', 유형) 키로 메모리 예산 안에서 보관
+    def __init__(self, df_apt, spatial_index, max_radius_m=PROFILE_MAX_RADIUS_M, cache=None, key_prefix=(),
+                 executor=None, budget_bytes=PROFILE_BUDGET_MB * 1024 * 1024):
+        self.apt_lat, self.apt_lng = apartment_coordinates(df_apt)
+        self.spatial_index = spatial_index
+        self.max_radius_m = max_radius_m
+        self.cache = cache
+        self.key_prefix = tuple(key_prefix)
+        self.executor = executor
+        self.budget_bytes = budget_bytes
+        self._profiles = {}
+        self._refused = set()    # 예산을 넘어 프로파일을 만들지 않는 유형
+        self._pending = {}       # 유형 -> 백그라운드 생성 Future
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        n_apt = len(self.apt_lat)
+        self._sample = (np.sort(np.random.default_rng(0).choice(n_apt, PROFILE_SAMPLE_SIZE, replace=False))
+                        if n_apt > PROFILE_SAMPLE_SIZE else None)
+
+    @property
+    def limit_bytes(self):
+        # 결과 캐시에 보관할 때는 캐시 예산도 넘지 않아야 함 (넘으면 캐시가 버려서 매번 다시 만들게 됨)
+        if self.cache is None:
+            return self.budget_bytes
+        return min(self.budget_bytes, self.cache.max_bytes)
+
+    def _cache_key(self, infra_type):
+        return self.key_prefix + ('profile', infra_type)
+
+    def _index(self, infra_type):
+        index = self.spatial_index.get(infra_type)
+        return index if index is not None and len(index) > 0 else None
+
+    def estimate_pairs(self, infra_type):
+        # max_radius 이내 (아파트, 시설) 쌍 수. 아파트가 많으면 표본의 평균 개수로 추정
+        index = self._index(infra_type)
+        if index is None:
+            return 0
+        if self._sample is None:
+            return int(index.count_within(self.apt_lat, self.apt_lng, self.max_radius_m).sum())
+        counts = index.count_within(self.apt_lat[self._sample], self.apt_lng[self._sample], self.max_radius_m)
+        return int(np.ceil(counts.mean() * len(self.apt_lat)))
+
+    def estimate_nbytes(self, infra_type, pairs=None):
+        # 생성 중 최대 메모리 = 완성된 프로파일 + 묶음(PROFILE_BUILD_CHUNK 개 아파트) 하나의 작업 배열
+        # + 오프셋 계산용 임시 배열과 묶음별 고정 작업 배열(BUILD_OVERHEAD_BYTES)
+        n_apt = len(self.apt_lat)
+        if pairs is None:
+            pairs = self.estimate_pairs(infra_type)
+        chunk_pairs = pairs / max(n_apt, 1) * min(PROFILE_BUILD_CHUNK, n_apt)
+        return (DistanceProfile.nbytes_for(n_apt, pairs) + int(chunk_pairs * BUILD_BYTES_PER_PAIR)
+                + (n_apt + 1) * 8 + BUILD_OVERHEAD_BYTES)
+
+    def peek(self, infra_type):
+        # 이미 메모리에 있는 프로파일만 반환 (없으면 None, 계산하지 않음)
+        profile = self._profiles.get(infra_type)
+        if profile is None and self.cache is not None:
+            profile = self.cache.get(self._cache_key(infra_type))
+        return profile
+
+    def _ensure(self, infra_type):
+        # 예산 안이면 프로파일을 만들어 보관. 예산 초과면 거절 기록 후 None
+        with self._build_lock:
+            profile = self.peek(infra_type)
+            if profile is not None or infra_type in self._refused:
+                return profile
+            index = self._index(infra_type)
+            if index is None:
+                return None
+            pairs = self.estimate_pairs(infra_type)
+            nbytes = self.estimate_nbytes(infra_type, pairs)
+            if nbytes > self.limit_bytes:
+                self._refused.add(infra_type)
+                logger.info("distance profile for %s skipped: %.0f MB > budget %.0f MB",
+                            infra_type, nbytes / 1e6, self.limit_bytes / 1e6)
+                return None
+            # 표본 추정이 조금 모자라도 배열을 한 번만 늘리도록 여유를 둠
+            profile = DistanceProfile.from_index(index, self.apt_lat, self.apt_lng, self.max_radius_m,
+                                                 capacity=int(pairs * 1.05))
+            if self.cache is not None:
+                return self.cache.put(self._cache_key(infra_type), profile)
+            self._profiles[infra_type] = profile
+            return profile
+
+    def get(self, infra_type):
+        # 프로파일 반환 (없으면 예산 안에서 바로 생성). 시설이 없거나 예산을 넘는 유형은 None
+        profile = self.peek(infra_type)
+        if profile is not None or infra_type in self._refused:
+            return profile
+        return self._ensure(infra_type)
+
+    def prefetch(self, infra_type):
+        # executor 에서 프로파일 생성 (이미 있거나, 진행 중이거나, 예산 초과로 거절된 유형은 무시)
+        if self.executor is None or self.peek(infra_type) is not None or self._index(infra_type) is None:
+            return None
+        with self._lock:
+            if infra_type in self._refused or infra_type in self._pending:
+                return self._pending.get(infra_type)
+            future = self.executor.submit(self._ensure, infra_type)
+            self._pending[infra_type] = future
+        future.add_done_callback(lambda f: self._prefetch_done(infra_type, f))
+        return future
+
+    def _prefetch_done(self, infra_type, future):
+        with self._lock:
+            self._pending.pop(infra_type, None)
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning("distance profile build for %s failed: %r", infra_type, future.exception())
+
+    def counts(self, infra_type, radius_m, apt_pos):
+        # 메모리에 프로파일이 있으면 이진 탐색. 없으면 공간 인덱스로 직접 질의하고
+        # (executor 가 있으면) 다음 슬라이더 이동을 위해 프로파일 생성을 백그라운드로 요청.
+        # 프로파일 상한보다 큰 반경과 예산 초과 유형은 항상 공간 인덱스로 직접 질의
+        if radius_m <= self.max_radius_m:
+            profile = self.peek(infra_type) if self.executor is not None else self.get(infra_type)
+            if profile is not None:
+                return profile.counts(radius_m, apt_pos)
+            self.prefetch(infra_type)
+        index = self.spatial_index[infra_type]
+        return index.count_within(self.apt_lat[apt_pos], self.apt_lng[apt_pos], radius_m)
+
+    def neighbors(self, infra_type, radius_m, apt_pos):
+        # 상세 목록: 아파트 하나의 반경 내 (시설 위치, 거리).
+        # 메모리에 있는 프로파일만 슬라이스하고 (생성하지 않음), 없거나 상한보다 큰 반경이면 None -> 호출자가 직접 계산
+        profile = self.peek(infra_type) if radius_m <= self.max_radius_m else None
+        if profile is None:
+            return None
+        return profile.neighbors(radius_m, apt_pos)
+
+    def facilities_within(self, infra_type, radius_m, apt_pos):
+        # 지도 마커: 아파트 목록 중 하나라도 반경 안에 두고 있는 시설 위치. neighbors 와 같이 없으면 None
+        profile = self.peek(infra_type) if radius_m <= self.max_radius_m else None
+        if profile is None:
+            return None
+        return profile.facilities_within(radius_m, apt_pos)
+
+
+def filter_with_profiles(df_apt, profiles, selected_filters, top_k=None):
+    # filter_with_index 와 같은 결과를 프로파일의 이진 탐색으로 계산 (프로파일이 없는 유형은 공간 인덱스)
+    if df_apt is None or df_apt.empty or not selected_filters:
+        return pd.DataFrame()
+
+    alive = np.arange(len(df_apt), dtype=np.int64)
+    counts = {}
+    for infra_type, radius_m in selected_filters.items():
+        index = profiles.spatial_index.get(infra_type)
+        if index is None or len(index) == 0:
+            return pd.DataFrame()
+        c = profiles.counts(infra_type, radius_m, alive)
+        keep = c > 0
+        alive = alive[keep]
+        for t in counts:
+            counts[t] = counts[t][keep]
+        counts[infra_type] = c[keep]
+        if len(alive) == 0:
+            return pd.DataFrame()
+
+    return assemble_filtered(df_apt, alive, counts, selected_filters, top_k=top_k)
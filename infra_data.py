@@ -0,0 +1,275 @@
+import os
+import json
+import hashlib
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# ====================================================================
+# --- 인프라 데이터 로드 (CSV 파싱 + 소스별 바이너리 스냅샷) ---
+# ====================================================================
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_DIR = os.path.join(BASE_DIR, '.infra_snapshot')
+SNAPSHOT_FORMAT = 2
+INFRA_COLUMNS = ['type', 'infra_name', 'lat', 'lng']
+
+
+ENCODINGS = ['utf-8', 'cp949', 'euc-kr']
+MAX_LOAD_WORKERS = 8
+
+
+def read_csv_safe(file_path, encoding=None, usecols=None):
+    # 소스에 지정된 인코딩을 먼저 시도하고, 실패하면 나머지 인코딩으로 재시도
+    encodings = [encoding] + [e for e in ENCODINGS if e != encoding] if encoding else ENCODINGS
+    for enc in encodings:
+        try:
+            return pd.read_csv(file_path, encoding=enc, usecols=usecols)
+        except UnicodeDecodeError:
+            continue
+    raise ValueError(f"❌ '{file_path}' 파일을 읽을 수 없습니다.")
+
+
+# --- 유형 파생 규칙 (행 단위 apply 대신 컬럼 연산) ---
+
+def classify_hospitals(df):
+    # 응급의료기관(‘이외’ 제외)이거나 응급실 운영(1)이면 대형병원, 나머지는 일반병원
+    code_name = df.get('응급의료기관코드명', pd.Series('', index=df.index)).astype(str)
+    emergency = code_name.str.contains('응급', regex=False) & ~code_name.str.contains('이외', regex=False)
+    er_open = pd.to_numeric(df.get('응급실운영여부(1/2)', pd.Series(np.nan, index=df.index)), errors='coerce') == 1
+    return np.where(emergency | er_open, '대형병원', '일반병원')
+
+
+# --- 소스 레지스트리 ---
+# key        : 스냅샷 디렉터리 이름
+# label      : 로드 결과 표시명
+# file       : BASE_DIR 기준 CSV 파일
+# rename     : 원본 컬럼 -> type / infra_name / lat / lng
+# type       : 고정 유형 (type_column 이 있으면 빈 값 대체용 기본값)
+# type_column: 유형을 담은 컬럼 (rename 이후 이름)
+# derive_type: (DataFrame -> 유형 배열) 규칙, columns 에 필요한 원본 컬럼 명시
+# encoding   : 먼저 시도할 인코딩 (없으면 utf-8 -> cp949 -> euc-kr)
+# 새 시설 CSV 는 항목 하나만 추가하면 되고, 모든 소스는 스레드 풀에서 동시에 로드된다.
+
+INFRA_SOURCES = [
+    {'key': 'school', 'label': '학교', 'file': 'school.csv',
+     'rename': {'school_name': 'infra_name'}, 'type_column': 'type'},
+    {'key': 'art', 'label': '문화시설', 'file': 'art.csv',
+     'rename': {'문화시설명': 'infra_name'}, 'type': '문화시설'},
+    {'key': 'hospital', 'label': '병원', 'file': 'hospital.csv', 'encoding': 'cp949',
+     'rename': {'기관명': 'infra_name'}, 'derive_type': classify_hospitals,
+     'columns': ['응급의료기관코드명', '응급실운영여부(1/2)']},
+    {'key': 'park', 'label': '공원', 'file': 'park.csv',
+     'rename': {'공원명': 'infra_name'}, 'type': '공원'},
+    {'key': 'bus_stop', 'label': '버스정류장', 'file': 'bus_stop.csv',
+     'rename': {'name': 'infra_name'}, 'type': '버스정류장'},
+    {'key': 'subway', 'label': '지하철역', 'file': 'subway.csv',
+     'rename': {'name': 'infra_name', '역사명': 'infra_name'}, 'type': '지하철역'},
+    {'key': 'big_market', 'label': '대형마트', 'file': 'big_market.csv',
+     'rename': {'사업장명': 'infra_name', '업태구분명': 'type'}, 'type_column': 'type', 'type': '대형마트'},
+    {'key': 'gym', 'label': '체육시설', 'file': 'gym.csv',
+     'rename': {'name': 'infra_name', '위도': 'lat', '경도': 'lng'}, 'type_column': 'type', 'type': '기타'},
+]
+
+
+def _source_columns(source):
+    # 실제로 읽을 원본 컬럼 (나머지 컬럼은 파싱하지 않음)
+    wanted = set(source.get('rename', {})) | set(source.get('columns', ())) | set(INFRA_COLUMNS)
+    return lambda col: col in wanted
+
+def parse_source(source, path):
+    # 레지스트리 항목 하나를 (type, infra_name, lat, lng) DataFrame 으로 변환
+    df = read_csv_safe(path, source.get('encoding'), usecols=_source_columns(source))
+    derive_type = source.get('derive_type')
+    derived = derive_type(df) if derive_type is not None else None
+    df = df.rename(columns=source.get('rename', {}))
+    df = df.loc[:, ~df.columns.duplicated()]
+
+    if derived is not None:
+        df['type'] = derived
+    elif source.get('type_column') in df.columns:
+        df['type'] = df[source['type_column']]
+        if source.get('type') is not None:
+            df['type'] = df['type'].fillna(source['type'])
+    else:
+        df['type'] = source['type']
+
+    missing = [c for c in INFRA_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"필수 컬럼 없음: {', '.join(missing)}")
+    return df[INFRA_COLUMNS]
+
+def _source_spec_hash(source):
+    # 레지스트리 정의가 바뀌면 (컬럼 매핑, 유형 규칙 등) 스냅샷도 다시 만든다
+    spec = {k: (getattr(v, '__qualname__', None) or repr(v)) if callable(v) else v for k, v in source.items()}
+    return hashlib.sha1(json.dumps(spec, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+# --- 스냅샷 (소스 1개 = 디렉터리 1개: coords.npy, types.npy, names.npy, meta.json) ---
+
+def _file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def source_signature():
+    # st.cache_data 키로 쓰는 가벼운 서명 (파일별 mtime, 크기)
+    sig = []
+    for source in INFRA_SOURCES:
+        file_name = source['file']
+        path = os.path.join(BASE_DIR, file_name)
+        try:
+            st_ = os.stat(path)
+            sig.append((file_name, st_.st_mtime_ns, st_.st_size))
+        except OSError:
+            sig.append((file_name, None, None))
+    return tuple(sig)
+
+def _to_arrays(df):
+    # 파싱 결과를 고정 폭 배열로 변환 (좌표는 연속 float64, 유형은 코드 + 테이블)
+    df = df[INFRA_COLUMNS]
+    coords = np.vstack([
+        pd.to_numeric(df['lat'], errors='coerce').to_numpy(dtype=np.float64),
+        pd.to_numeric(df['lng'], errors='coerce').to_numpy(dtype=np.float64),
+    ])
+    type_codes, types = pd.factorize(df['type'].astype(object).where(df['type'].notna(), ''))
+    names = df['infra_name'].astype(object).where(df['infra_name'].notna(), '').astype(str).to_numpy()
+    return coords, type_codes.astype(np.int16), [str(t) for t in types], names.astype(str)
+
+def _from_arrays(coords, type_codes, types, names):
+    return pd.DataFrame({
+        'type': np.asarray(types, dtype=object)[np.asarray(type_codes)],
+        'infra_name': np.asarray(names, dtype=object),
+        'lat': coords[0],
+        'lng': coords[1],
+    })
+
+def _write_snapshot(key, coords, type_codes, types, names, meta):
+    target = os.path.join(SNAPSHOT_DIR, key)
+    os.makedirs(target, exist_ok=True)
+    meta_path = os.path.join(target, 'meta.json')
+    # meta.json 이 마지막에 기록되므로, 중간에 실패하면 다음 로드 때 다시 파싱됨
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    np.save(os.path.join(target, 'coords.npy'), np.ascontiguousarray(coords))
+    np.save(os.path.join(target, 'types.npy'), type_codes)
+    np.save(os.path.join(target, 'names.npy'), names)
+    meta = dict(meta, types=types, rows=int(coords.shape[1]), format=SNAPSHOT_FORMAT)
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, meta_path)
+
+def _read_snapshot_meta(key):
+    try:
+        with open(os.path.join(SNAPSHOT_DIR, key, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get('format') == SNAPSHOT_FORMAT else None
+
+def _map_snapshot(key, meta):
+    target = os.path.join(SNAPSHOT_DIR, key)
+    coords = np.load(os.path.join(target, 'coords.npy'), mmap_mode='r')
+    type_codes = np.load(os.path.join(target, 'types.npy'), mmap_mode='r')
+    names = np.load(os.path.join(target, 'names.npy'), mmap_mode='r')
+    return _from_arrays(coords, type_codes, meta['types'], names)
+
+def load_source(source, use_snapshot=True):
+    # 반환: (DataFrame, 스냅샷 사용 여부)
+    # 스냅샷은 CSV 의 mtime/크기가 같으면 그대로, 다르면 sha1 이 같을 때만 재사용
+    key, file_name = source['key'], source['file']
+    path = os.path.join(BASE_DIR, file_name)
+    st_ = os.stat(path)
+    spec = _source_spec_hash(source)
+    meta = _read_snapshot_meta(key) if use_snapshot else None
+    if meta is not None and meta.get('spec') != spec:
+        meta = None
+    if meta is not None:
+        if meta.get('mtime_ns') == st_.st_mtime_ns and meta.get('size') == st_.st_size:
+            return _map_snapshot(key, meta), True
+        sha1 = _file_sha1(path)
+        if meta.get('sha1') == sha1:
+            df = _map_snapshot(key, meta)
+            _touch_snapshot_meta(key, meta, st_)
+            return df, True
+    else:
+        sha1 = _file_sha1(path) if use_snapshot else None
+
+    coords, type_codes, types, names = _to_arrays(parse_source(source, path))
+    if use_snapshot:
+        try:
+            _write_snapshot(key, coords, type_codes, types, names,
+                            {'source': file_name, 'mtime_ns': st_.st_mtime_ns, 'size': st_.st_size,
+                             'sha1': sha1, 'spec': spec})
+        except OSError:
+            pass  # 읽기 전용 배포 환경에서는 스냅샷 없이 동작
+    return _from_arrays(coords, type_codes, types, names), False
+
+def _touch_snapshot_meta(key, meta, st_):
+    # 내용은 같고 mtime 만 바뀐 경우 (git checkout 등) 다음부터 해시 계산을 건너뜀
+    meta = dict(meta, mtime_ns=st_.st_mtime_ns, size=st_.st_size)
+    meta_path = os.path.join(SNAPSHOT_DIR, key, 'meta.json')
+    try:
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(meta_path + '.tmp', meta_path)
+    except OSError:
+        pass
+
+def _load_timed(source, use_snapshot):
+    # 소스 하나의 로드 결과와 소요 시간. 오류는 삼키지 않고 결과에 담아 소스별로 보고
+    started = time.perf_counter()
+    result = {'key': source['key'], 'label': source['label'], 'file': source['file'],
+              'df': None, 'rows': 0, 'snapshot': False, 'error': None}
+    try:
+        result['df'], result['snapshot'] = load_source(source, use_snapshot)
+        result['rows'] = len(result['df'])
+    except FileNotFoundError:
+        result['error'] = "파일 없음"
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+def load_sources(sources=None, use_snapshot=True, max_workers=MAX_LOAD_WORKERS):
+    # 레지스트리의 모든 소스를 스레드 풀에서 동시에 로드 (결과는 레지스트리 순서)
+    sources = INFRA_SOURCES if sources is None else sources
+    if not sources:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sources))), thread_name_prefix='infra-load') as pool:
+        return list(pool.map(lambda source: _load_timed(source, use_snapshot), sources))
+
+def load_all_infrastructure_data(use_snapshot=True):
+    all_data = []
+    debug_info = []
+
+    for result in load_sources(use_snapshot=use_snapshot):
+        if result['error'] is not None:
+            debug_info.append(f"❌ {result['label']} ({result['file']}): {result['error']} · {result['ms']:.0f} ms")
+            continue
+        all_data.append(result['df'])
+        suffix = "스냅샷, " if result['snapshot'] else ""
+        debug_info.append(f"✅ {result['label']}: {result['rows']}개 로드 ({suffix}{result['ms']:.0f} ms)")
+
+    if not all_data: return pd.DataFrame(), debug_info
+    return pd.concat(all_data, ignore_index=True), debug_info
+
+def build_snapshot():
+    # 배포 전에 미리 스냅샷을 만들어 두면 서버 기동 시에는 파일 매핑만 수행
+    _, debug_info = load_all_infrastructure_data(use_snapshot=True)
+    return debug_info
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="인프라 CSV 바이너리 스냅샷 관리")
+    parser.add_argument('command', choices=['build-snapshot'])
+    args = parser.parse_args()
+    if args.command == 'build-snapshot':
+        for line in build_snapshot():
+            print(line)
@@ -0,0 +1,102 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from spatial_index import GridSpatialIndex
+
+# ====================================================================
+# --- 프로세스 공용 읽기 전용 인프라 저장소 ---
+# ====================================================================
+# st.cache_resource 로 한 번만 만들어 모든 세션이 복사 없이 공유한다.
+# - type / infra_name 은 category (시설명은 중복 제거된 테이블 + 코드로 인턴)
+# - 유형별 좌표는 연속 배열로 미리 분리하고 라디안, cos(위도)까지 계산해 둠
+#   -> df_infra[df_infra['type'] == t] 식의 전체 스캔이 필요 없음
+# 모든 배열은 writeable=False. frame 도 공유 객체이므로 호출하는 쪽에서 수정하면 안 된다.
+
+
+def _readonly(arr):
+    arr = np.ascontiguousarray(arr)
+    arr.flags.writeable = False
+    return arr
+
+
+class InfraTypeArrays:
+    # 한 유형의 시설 좌표 (df_infra[type == t] 와 같은 순서)
+    __slots__ = ('infra_type', 'lat', 'lng', 'lat_rad', 'lng_rad', 'cos_lat', 'name_codes')
+
+    def __init__(self, infra_type, lat, lng, name_codes):
+        self.infra_type = infra_type
+        self.lat = _readonly(lat)
+        self.lng = _readonly(lng)
+        self.lat_rad = _readonly(np.radians(lat))
+        self.lng_rad = _readonly(np.radians(lng))
+        self.cos_lat = _readonly(np.cos(self.lat_rad))
+        self.name_codes = _readonly(name_codes)
+
+    def __len__(self):
+        return len(self.lat)
+
+
+class InfraStore:
+    def __init__(self, df_infra, debug_info=()):
+        self.debug_info = list(debug_info)
+        if df_infra is None or df_infra.empty:
+            df_infra = pd.DataFrame({'type': [], 'infra_name': [], 'lat': [], 'lng': []})
+
+        type_cat = pd.Categorical(df_infra['type'].astype(object).where(df_infra['type'].notna(), ''))
+        name_cat = pd.Categorical(df_infra['infra_name'].astype(object).where(df_infra['infra_name'].notna(), ''))
+        lat = pd.to_numeric(df_infra['lat'], errors='coerce').to_numpy(dtype=np.float64)
+        lng = pd.to_numeric(df_infra['lng'], errors='coerce').to_numpy(dtype=np.float64)
+
+        self.names = _readonly(np.asarray(name_cat.categories, dtype=object))
+        self.frame = pd.DataFrame({'type': type_cat, 'infra_name': name_cat, 'lat': lat, 'lng': lng})
+
+        # 유형 코드로 한 번 안정 정렬해 유형별 구간으로 분리 (유형 내 순서는 원래 순서 유지)
+        type_codes = type_cat.codes
+        order = np.argsort(type_codes, kind='stable')
+        bounds = np.searchsorted(type_codes[order], np.arange(len(type_cat.categories) + 1))
+        name_codes = name_cat.codes.astype(np.int32)
+        self.types = {}
+        for code, infra_type in enumerate(type_cat.categories):
+            rows = order[bounds[code]:bounds[code + 1]]
+            if len(rows):
+                self.types[infra_type] = InfraTypeArrays(infra_type, lat[rows], lng[rows], name_codes[rows])
+
+        self._frames = {}
+        self._spatial_index = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def empty(self):
+        return len(self.frame) == 0
+
+    def of_type(self, infra_type):
+        return self.types.get(infra_type)
+
+    def frame_of_type(self, infra_type):
+        # 유형별 DataFrame (type, infra_name, lat, lng). 처음 요청될 때 한 번만 생성
+        frame = self._frames.get(infra_type)
+        if frame is None:
+            arrays = self.types.get(infra_type)
+            if arrays is None:
+                return self.frame.iloc[:0]
+            frame = pd.DataFrame({
+                'type': infra_type,
+                'infra_name': self.names[arrays.name_codes],
+                'lat': arrays.lat,
+                'lng': arrays.lng,
+            })
+            self._frames[infra_type] = frame
+        return frame
+
+    def spatial_index(self):
+        # 저장소당 한 번만 만드는 유형별 격자 인덱스 (위치는 유형별 배열 순서와 동일)
+        if self._spatial_index is None:
+            with self._lock:
+                if self._spatial_index is None:
+                    self._spatial_index = {t: GridSpatialIndex(a.lat, a.lng) for t, a in self.types.items()}
+        return self._spatial_index
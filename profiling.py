@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import contextlib
+
+# ====================================================================
+# --- 단계별 실행 시간 / 캐시 적중 계측 ---
+# ====================================================================
+# Streamlit 재실행(rerun) 1회 = RunProfile 1개. 각 단계는 stage() 로 감싸고,
+# st.cache_data / st.cache_resource 함수 본문은 cached_body() 로 감싸면
+# 본문이 실행된 경우 miss, 아니면 hit 으로 기록된다.
+# (벽시계 시간 - 본문 시간 = 캐시 키 해싱 + 직렬화 오버헤드)
+#
+# 구조화 로그: logger 'infra_dashboard.perf' 에 단계별 / 재실행별 JSON 한 줄씩 기록.
+# 환경변수 INFRA_PERF_LOG 에 파일 경로를 주면 해당 파일에도 추가 기록.
+
+logger = logging.getLogger('infra_dashboard.perf')
+_local = threading.local()
+
+
+def _configure_logger():
+    if logger.handlers:
+        return
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    log_path = os.environ.get('INFRA_PERF_LOG')
+    if log_path:
+        file_handler = logging.FileHandler(log_path, encoding='utf-8')
+        file_handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(file_handler)
+
+_configure_logger()
+
+
+class RunProfile:
+    def __init__(self, session_id=None):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.session_id = session_id
+        self.started = time.perf_counter()
+        self.stages = []
+        self.total_ms = None
+        self.debug_info = []
+        self.panel = None   # 사이드바 진단 패널 자리 (있으면 재실행 끝에 채움)
+        self.warmup = None  # 프로세스 기동 워밍업 보고서 (warmup.WarmupReport)
+
+    @contextlib.contextmanager
+    def stage(self, name, rows=None, **fields):
+        # 사용 예: with profile.stage('filter_apartments', rows=len(df)) as rec: ...; rec['out_rows'] = n
+        rec = {'stage': name, 'rows': rows}
+        rec.update(fields)
+        self.stages.append(rec)
+        parent = getattr(_local, 'stage', None)
+        _local.stage = rec
+        started = time.perf_counter()
+        try:
+            yield rec
+        finally:
+            rec['ms'] = round((time.perf_counter() - started) * 1000, 2)
+            _local.stage = parent
+            if 'compute_ms' in rec:
+                rec['cache'] = 'miss'
+                rec['cache_overhead_ms'] = round(rec['ms'] - rec['compute_ms'], 2)
+            elif rec.get('cached'):
+                rec['cache'] = 'hit'
+                rec['cache_overhead_ms'] = rec['ms']
+            rec.pop('cached', None)
+            self._log({'event': 'stage', **rec})
+
+    def finish(self):
+        self.total_ms = round((time.perf_counter() - self.started) * 1000, 2)
+        self._log({'event': 'rerun', 'total_ms': self.total_ms, 'stages': self.stages})
+        if _local_profile() is self:
+            _local.profile = None
+
+    def _log(self, payload):
+        payload = {'ts': round(time.time(), 3), 'run_id': self.run_id, 'session': self.session_id, **payload}
+        logger.info(json.dumps(payload, ensure_ascii=False, default=str))
+
+
+def _local_profile():
+    return getattr(_local, 'profile', None)
+
+
+def start_run(session_id=None):
+    profile = RunProfile(session_id)
+    _local.profile = profile
+    return profile
+
+
+@contextlib.contextmanager
+def stage(name, rows=None, **fields):
+    # 진행 중인 RunProfile 이 없으면 (배치/벤치마크 등) 기록만 생략
+    profile = _local_profile()
+    if profile is None:
+        yield dict(fields, stage=name, rows=rows)
+        return
+    with profile.stage(name, rows=rows, **fields) as rec:
+        yield rec
+
+
+@contextlib.contextmanager
+def detached_stage(name, rows=None, **fields):
+    # 재실행 밖(다운로드 버튼의 지연 생성처럼 별도 스레드)에서 실행되는 단계: 재실행 단계와 같은 형식으로 한 줄 기록
+    rec = {'stage': name, 'rows': rows}
+    rec.update(fields)
+    started = time.perf_counter()
+    try:
+        yield rec
+    finally:
+        rec['ms'] = round((time.perf_counter() - started) * 1000, 2)
+        logger.info(json.dumps({'ts': round(time.time(), 3), 'event': 'stage', **rec}, ensure_ascii=False, default=str))
+
+
+def cached_stage(name, rows=None, **fields):
+    # 캐시 함수 호출을 감싸는 단계: 본문이 실행되지 않으면 hit 로 기록
+    return stage(name, rows=rows, cached=True, **fields)
+
+
+@contextlib.contextmanager
+def cached_body(name=None):
+    # st.cache_* 함수 본문 안에서 사용 -> 바깥 단계에 miss 와 본문 계산 시간을 기록
+    rec = getattr(_local, 'stage', None)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if rec is not None and (name is None or rec['stage'] == name):
+            rec['compute_ms'] = round((time.perf_counter() - started) * 1000, 2)
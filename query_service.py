@@ -0,0 +1,71 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ====================================================================
+# --- 프로세스 공용 질의 서비스 (동일 질의 합치기 + 제한된 작업 풀 + 수용 제어) ---
+# ====================================================================
+# 여러 세션이 같은 키(업로드 지문, 인프라 서명, 필터 ...)로 동시에 요청하면 첫 요청만 계산하고
+# 나머지는 같은 Future 를 기다린다. 계산은 스크립트 스레드 밖의 작업 풀에서 수행.
+# 비용(아파트 수 x 유형 수)이 큰 질의는 별도의 좁은 레인에서 돌려, 큰 업로드 하나가
+# 다른 사용자의 일반 질의를 굶기지 않도록 한다. 레인별 대기열이 가득 차면 즉시 거절.
+
+DEFAULT_WORKERS = int(os.environ.get('INFRA_QUERY_WORKERS', str(min(4, os.cpu_count() or 1))))
+HEAVY_WORKERS = int(os.environ.get('INFRA_QUERY_HEAVY_WORKERS', '1'))
+MAX_PENDING = int(os.environ.get('INFRA_QUERY_MAX_PENDING', '32'))
+MAX_HEAVY_PENDING = int(os.environ.get('INFRA_QUERY_MAX_HEAVY_PENDING', '4'))
+HEAVY_COST = int(os.environ.get('INFRA_QUERY_HEAVY_COST', '1000000'))
+
+
+class QueryRejected(RuntimeError):
+    pass
+
+
+class QueryService:
+    def __init__(self, workers=DEFAULT_WORKERS, heavy_workers=HEAVY_WORKERS, max_pending=MAX_PENDING,
+                 max_heavy_pending=MAX_HEAVY_PENDING, heavy_cost=HEAVY_COST):
+        self.heavy_cost = heavy_cost
+        self._pools = {
+            'light': ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='infra-query'),
+            'heavy': ThreadPoolExecutor(max_workers=max(1, heavy_workers), thread_name_prefix='infra-query-heavy'),
+        }
+        self._limits = {'light': max_pending, 'heavy': max_heavy_pending}
+        self._pending = {'light': 0, 'heavy': 0}   # 대기 + 실행 중인 질의 수
+        self._inflight = {}                         # key -> Future
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def submit(self, key, compute, cost=0):
+        # 반환: (Future, 합쳐졌는지 여부). 레인이 가득 차면 QueryRejected
+        lane = 'heavy' if cost >= self.heavy_cost else 'light'
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, True
+            if self._pending[lane] >= self._limits[lane]:
+                self.rejected += 1
+                raise QueryRejected("⏳ 지금은 분석 요청이 많아 처리할 수 없습니다. 잠시 후 다시 시도해 주세요.")
+            self._pending[lane] += 1
+            self.submitted += 1
+            future = self._pools[lane].submit(compute)
+            self._inflight[key] = future
+        future.add_done_callback(lambda f: self._done(key, lane, f))
+        return future, False
+
+    def _done(self, key, lane, future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            self._pending[lane] -= 1
+            if not future.cancelled() and future.exception() is not None:
+                self.failed += 1
+
+    def stats(self):
+        with self._lock:
+            return {'inflight': len(self._inflight), 'light': self._pending['light'], 'heavy': self._pending['heavy'],
+                    'submitted': self.submitted, 'coalesced': self.coalesced,
+                    'rejected': self.rejected, 'failed': self.failed}
\ No newline at end of file
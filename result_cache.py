@@ -0,0 +1,101 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# ====================================================================
+# --- 메모리 예산 기반 LRU 결과 캐시 ---
+# ====================================================================
+# 키는 (업로드 지문, 인프라 서명, 시설 유형, 반경) 같은 튜플, 값은 numpy 배열, 바이트/문자열(지도 HTML),
+# DataFrame 또는 nbytes 속성을 가진 객체. 전체 크기가 max_bytes 를 넘으면 가장 오래 안 쓴 항목부터 제거.
+
+DEFAULT_BUDGET_MB = int(os.environ.get('INFRA_RESULT_CACHE_MB', '512'))
+
+
+def _nbytes(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return sys.getsizeof(value)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    nbytes = getattr(value, 'nbytes', None)
+    if nbytes is not None:
+        return int(nbytes)
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    return 0
+
+
+class LRUResultCache:
+    def __init__(self, max_bytes=DEFAULT_BUDGET_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.oversized = 0              # 예산보다 커서 보관하지 못한 값의 수
+        self._entries = OrderedDict()   # key -> (value, nbytes)
+        self._lock = threading.RLock()
+        self._key_locks = {}            # 같은 키를 동시에 두 번 계산하지 않도록
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        size = _nbytes(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            if size > self.max_bytes:
+                self.oversized += 1
+                return value   # 예산보다 큰 값은 캐시하지 않고 그대로 반환 (큰 값을 만드는 쪽은 max_bytes 로 미리 확인)
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and self._entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted
+                self.evictions += 1
+        return value
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self.misses += 1
+            try:
+                return self.put(key, compute())
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'mb': round(self.current_bytes / 1e6, 2),
+                    'budget_mb': round(self.max_bytes / 1e6, 2), 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions, 'oversized': self.oversized}
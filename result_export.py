@@ -0,0 +1,140 @@
+import io
+import json
+import hashlib
+import importlib.util
+
+import numpy as np
+import pandas as pd
+
+# ====================================================================
+# --- 결과 내보내기 (CSV / Parquet / GeoJSON / 주변 시설 상세 번들) ---
+# ====================================================================
+# 다운로드 버튼을 누를 때만 파일을 만들고 (st.download_button 의 callable data),
+# 만든 바이트는 결과 지문별로 결과 캐시에 보관한다. 큰 결과는 청크 단위로 직렬화해
+# 전체 문자열 사본을 한 번에 만들지 않는다.
+
+EXPORT_CHUNK_ROWS = 50_000     # 표 형식 내보내기의 청크 행 수
+DETAIL_CHUNK_APTS = 2_000      # 상세 번들: 한 번에 반경 질의하는 아파트 수
+
+# 형식 키 -> (표시명, MIME, 파일 확장자)
+EXPORT_FORMATS = {
+    'csv': ('CSV', 'text/csv', '.csv'),
+    'parquet': ('Parquet', 'application/vnd.apache.parquet', '.parquet'),
+    'geojson': ('GeoJSON (지도용)', 'application/geo+json', '.geojson'),
+    'detail': ('주변 시설 상세 번들 (CSV)', 'text/csv', '_details.csv'),
+}
+DETAIL_COLUMNS = ['순위', '자치구명', '주소', '건물명', '인프라_유형', '시설명', '거리(m)', 'lat', 'lng']
+
+
+def available_formats():
+    # Parquet 은 pyarrow 가 설치된 경우에만
+    formats = list(EXPORT_FORMATS)
+    if importlib.util.find_spec('pyarrow') is None:
+        formats.remove('parquet')
+    return formats
+
+
+def result_fingerprint(*parts):
+    # (업로드 지문, 인프라 서명, 필터, 순위 범위 ...) -> 내보내기 캐시 키
+    return hashlib.blake2b(repr(parts).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _iter_chunks(df, chunk_rows):
+    for start in range(0, len(df), chunk_rows):
+        yield start, df.iloc[start:start + chunk_rows]
+
+
+def write_csv(df, out, chunk_rows=EXPORT_CHUNK_ROWS):
+    # 엑셀 호환을 위해 첫 청크에만 BOM + 헤더
+    if df.empty:
+        out.write(df.to_csv(index=False).encode('utf-8-sig'))
+        return
+    for start, chunk in _iter_chunks(df, chunk_rows):
+        out.write(chunk.to_csv(index=False, header=start == 0).encode('utf-8-sig' if start == 0 else 'utf-8'))
+
+
+def write_parquet(df, out, chunk_rows=EXPORT_CHUNK_ROWS):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(out, schema) as writer:
+        for _, chunk in _iter_chunks(df, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def write_geojson(df, lat, lng, out, chunk_rows=EXPORT_CHUNK_ROWS):
+    # 속성은 df 컬럼, 좌표는 lat/lng 배열 (GeoJSON 좌표 순서는 [경도, 위도])
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    out.write(b'{"type": "FeatureCollection", "features": [')
+    first = True
+    for start, chunk in _iter_chunks(df, chunk_rows):
+        records = chunk.astype(object).where(chunk.notna(), None).to_dict('records')
+        parts = []
+        for i, props in enumerate(records, start):
+            geometry = {'type': 'Point', 'coordinates': [float(lng[i]), float(lat[i])]} if np.isfinite(lat[i]) and np.isfinite(lng[i]) else None
+            parts.append(json.dumps({'type': 'Feature', 'geometry': geometry, 'properties': props},
+                                    ensure_ascii=False, default=str))
+        if parts:
+            out.write(((',' if not first else '') + ','.join(parts)).encode('utf-8'))
+            first = False
+    out.write(b']}')
+
+
+def iter_detail_frames(df_map, infra, spatial_index, selected_filters, chunk_apts=DETAIL_CHUNK_APTS):
+    # 필터링된 모든 아파트의 반경 내 시설 행을 아파트 묶음 단위로 생성.
+    # 묶음마다 유형별 일괄 반경 질의 1번 -> (아파트 순위, 거리) 순 정렬. 결과는 상세 보기와 같은 행
+    apt_lat = pd.to_numeric(df_map['latitude'], errors='coerce').to_numpy(dtype=np.float64)
+    apt_lng = pd.to_numeric(df_map['longitude'], errors='coerce').to_numpy(dtype=np.float64)
+    apt_cols = {c: df_map[c].astype(object).to_numpy() if c in df_map.columns else np.full(len(df_map), '', dtype=object)
+                for c in ['자치구명', '주소', '건물명']}
+
+    for begin in range(0, len(df_map), chunk_apts):
+        end = min(begin + chunk_apts, len(df_map))
+        parts = []
+        for infra_type, radius_m in selected_filters.items():
+            index = spatial_index.get(infra_type)
+            arrays = infra.of_type(infra_type)
+            if index is None or arrays is None or len(index) == 0:
+                continue
+            apt_idx, fac, dist = index.query_radius(apt_lat[begin:end], apt_lng[begin:end], radius_m)
+            if len(apt_idx) == 0:
+                continue
+            parts.append((apt_idx + begin, np.full(len(apt_idx), infra_type, dtype=object),
+                          infra.names[arrays.name_codes[fac]], dist, arrays.lat[fac], arrays.lng[fac]))
+        if not parts:
+            continue
+        apt_idx, types, names, dist, lat, lng = (np.concatenate([p[i] for p in parts]) for i in range(6))
+        order = np.lexsort((dist, apt_idx))
+        apt_idx = apt_idx[order]
+        frame = {'순위': apt_idx + 1}
+        frame.update({c: values[apt_idx] for c, values in apt_cols.items()})
+        frame.update({'인프라_유형': types[order], '시설명': names[order],
+                      '거리(m)': np.round(dist[order]).astype(int), 'lat': lat[order], 'lng': lng[order]})
+        yield pd.DataFrame(frame, columns=DETAIL_COLUMNS)
+
+
+def write_detail_bundle(df_map, infra, spatial_index, selected_filters, out, chunk_apts=DETAIL_CHUNK_APTS):
+    wrote_header = False
+    for frame in iter_detail_frames(df_map, infra, spatial_index, selected_filters, chunk_apts):
+        out.write(frame.to_csv(index=False, header=not wrote_header).encode('utf-8' if wrote_header else 'utf-8-sig'))
+        wrote_header = True
+    if not wrote_header:
+        out.write(pd.DataFrame(columns=DETAIL_COLUMNS).to_csv(index=False).encode('utf-8-sig'))
+
+
+def build_export(fmt, df_map, table, selected_filters, infra=None, spatial_index=None):
+    # table: 목록 형식 그대로의 표 (CSV / Parquet / GeoJSON 속성), df_map: 좌표를 가진 원본 결과
+    out = io.BytesIO()
+    if fmt == 'csv':
+        write_csv(table, out)
+    elif fmt == 'parquet':
+        write_parquet(table, out)
+    elif fmt == 'geojson':
+        write_geojson(table, df_map['latitude'].values, df_map['longitude'].values, out)
+    elif fmt == 'detail':
+        write_detail_bundle(df_map, infra, spatial_index, selected_filters, out)
+    else:
+        raise ValueError(f"❌ 지원하지 않는 내보내기 형식: {fmt}")
+    return out.getvalue()
@@ -0,0 +1,306 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# ====================================================================
+# --- 공간 인덱스 (인프라 유형별 격자 인덱스 + 일괄 반경 질의) ---
+# ====================================================================
+
+EARTH_RADIUS_M = 6371.0 * 1000.0
+DEFAULT_CELL_M = 250.0        # 격자 한 칸의 크기 (m)
+QUERY_CHUNK_SIZE = 4096       # 한 번에 질의하는 아파트 수 (메모리 상한)
+# 반경 판정 방식: 'planar' = 평면 근사(제곱 거리) + 경계 근처만 haversine, 'haversine' = 모든 후보 haversine
+DISTANCE_BACKEND = os.environ.get('INFRA_DISTANCE_BACKEND', 'planar')
+DISTANCE_BACKENDS = ('planar', 'haversine')
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    R = 6371.0
+    lat1_rad, lon1_rad = np.radians(lat1), np.radians(lon1)
+    lat2_rad, lon2_rad = np.radians(lat2), np.radians(lon2)
+    dlon = lon2_rad - lon1_rad
+    dlat = lat2_rad - lat1_rad
+    a = np.sin(dlat / 2)**2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon / 2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return R * c * 1000.0
+
+
+def haversine_rad(lat1_rad, lon1_rad, cos_lat1, lat2_rad, lon2_rad, cos_lat2):
+    # 라디안 좌표와 cos(위도)를 미리 계산해 둔 haversine (haversine() 과 같은 식이라 결과도 동일)
+    R = 6371.0
+    dlon = lon2_rad - lon1_rad
+    dlat = lat2_rad - lat1_rad
+    a = np.sin(dlat / 2)**2 + cos_lat1 * cos_lat2 * np.sin(dlon / 2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return R * c * 1000.0
+
+
+class GridSpatialIndex:
+    # 위경도 등간격 격자. 시설을 (행, 열) 셀 번호 순으로 정렬해 두고
+    # cell_start[셀] ~ cell_start[셀+1] 구간이 해당 셀의 시설이 되도록 한다 (CSR 구조).
+    # 셀 번호가 행 우선(row-major)이므로 한 행 안의 연속된 열 범위는 정렬 배열의 연속 구간이다.
+    #
+    # backend='planar': 좌표를 한 번 격자 원점 기준 float32 미터 배열(y = RΔφ, x = RΔλ)로 바꿔 두고 후보마다
+    #   d² = Δy² + cos φ1 cos φ2 · Δx²  (haversine 에서 sin x ≈ x, arcsin x ≈ x 로 둔 식)
+    # 의 제곱 거리로 반경 안/밖을 판정한다. 두 식의 상대 오차는 검색 창의 반각 u, v 에 대해 u² + v² 이하
+    # (5km 반경에서 약 2mm)이고 float32 반올림은 좌표 범위의 ulp 몇 개 이내이므로, 그 폭의 경계 띠에 든
+    # 후보만 float64 haversine 으로 다시 판정 -> 개수는 haversine 과 동일.
+    def __init__(self, lat, lng, cell_m=DEFAULT_CELL_M, backend=None):
+        if backend is None:
+            backend = DISTANCE_BACKEND
+        if backend not in DISTANCE_BACKENDS:
+            raise ValueError(f"❌ 지원하지 않는 거리 계산 방식: {backend}")
+        self.backend = backend
+        lat = np.asarray(lat, dtype=np.float64)
+        lng = np.asarray(lng, dtype=np.float64)
+        valid = np.isfinite(lat) & np.isfinite(lng)   # 좌표 없는 시설은 제외
+        positions = np.flatnonzero(valid)
+        lat, lng = lat[valid], lng[valid]
+
+        self.cell_m = float(cell_m)
+        self.size = len(lat)
+        if self.size == 0:
+            self.lat = self.lng = np.empty(0)
+            self.positions = positions
+            return
+
+        self.lat0, self.lng0 = lat.min(), lng.min()
+        self.max_abs_lat = np.abs(lat).max()
+        ref_cos = np.cos(np.radians(min(self.max_abs_lat, 89.0)))
+        self.cell_dlat = np.degrees(self.cell_m / EARTH_RADIUS_M)
+        self.cell_dlng = self.cell_dlat / ref_cos
+        self.ny = int((lat.max() - self.lat0) // self.cell_dlat) + 1
+        self.nx = int((lng.max() - self.lng0) // self.cell_dlng) + 1
+
+        iy = ((lat - self.lat0) // self.cell_dlat).astype(np.int64)
+        ix = ((lng - self.lng0) // self.cell_dlng).astype(np.int64)
+        cell_id = iy * self.nx + ix
+        order = np.argsort(cell_id, kind='stable')
+
+        self.lat = lat[order]
+        self.lng = lng[order]
+        self.lat_rad = np.radians(self.lat)   # 질의마다 다시 변환하지 않도록 미리 계산
+        self.lng_rad = np.radians(self.lng)
+        self.cos_lat = np.cos(self.lat_rad)
+        # 평면 근사용 미터 좌표 (격자 원점 기준이라 float32 로도 수 mm 정밀도)
+        self.lat0_rad, self.lng0_rad = np.radians(self.lat0), np.radians(self.lng0)
+        self.y_m = (EARTH_RADIUS_M * (self.lat_rad - self.lat0_rad)).astype(np.float32)
+        self.x_m = (EARTH_RADIUS_M * (self.lng_rad - self.lng0_rad)).astype(np.float32)
+        self.cos_lat32 = self.cos_lat.astype(np.float32)
+        self.extent_m = float(max(self.y_m.max(), self.x_m.max()))
+        self.positions = positions[order]   # 정렬 위치 -> 입력 배열의 원래 위치
+        self.cell_start = np.searchsorted(cell_id[order], np.arange(self.ny * self.nx + 1))
+
+    def __len__(self):
+        return self.size
+
+    def _search_window(self, radius_m):
+        # 반경 r 안의 점은 위도 차가 r/R 이하, 경도 차는
+        # sin(Δλ/2) <= sin(r/2R) / cos(φmax) 를 만족한다 (haversine 식의 하한에서 유도).
+        dlat = np.degrees(radius_m / EARTH_RADIUS_M)
+        cos_min = np.cos(np.radians(min(self.max_abs_lat + dlat, 89.0)))
+        s = min(1.0, np.sin(radius_m / (2 * EARTH_RADIUS_M)) / cos_min)
+        dlng = np.degrees(2 * np.arcsin(s))
+        ky = int(np.ceil(dlat / self.cell_dlat))
+        kx = int(np.ceil(dlng / self.cell_dlng))
+        return ky, kx
+
+    def _iter_chunks(self, apt_lat, apt_lng, chunk_size=QUERY_CHUNK_SIZE):
+        # 아파트를 chunk_size 단위로 나누고 좌표 없는 아파트는 제외
+        for begin in range(0, len(apt_lat), chunk_size):
+            q_lat = apt_lat[begin:begin + chunk_size]
+            q_lng = apt_lng[begin:begin + chunk_size]
+            q_idx = np.arange(begin, begin + len(q_lat))
+            ok = np.isfinite(q_lat) & np.isfinite(q_lng)
+            if not ok.all():
+                q_lat, q_lng, q_idx = q_lat[ok], q_lng[ok], q_idx[ok]
+            yield q_lat, q_lng, q_idx
+
+    def _planar_band(self, radius_m, ky, kx):
+        # 평면 근사 거리의 상대 오차 상한 δ: 후보는 검색 창 안이므로 |Δφ| <= (ky+1)칸, |Δλ| <= (kx+1)칸.
+        # float32 연산의 상대 오차(1e-6)와 좌표 반올림(검색 창까지 포함한 좌표 범위의 ulp x 4)을 더해
+        # d_planar <= r(1-δ)-e 이면 확실히 안, d_planar > r(1+δ)+e 이면 확실히 밖
+        u = np.radians((ky + 1) * self.cell_dlat) / 2
+        v = np.radians((kx + 1) * self.cell_dlng) / 2
+        delta = u * u + v * v + 1e-6
+        e = 4 * float(np.spacing(np.float32(self.extent_m + 2 * radius_m + 2 * self.cell_m)))
+        return max(radius_m * (1 - delta) - e, 0.0) ** 2, (radius_m * (1 + delta) + e) ** 2
+
+    def _iter_candidates(self, q_lat, q_lng, q_idx, radius_m, with_dist=True):
+        # 아파트 묶음 하나에 대해, 검색 창의 각 행(row)마다 후보 시설 구간을 펼쳐 거리 계산
+        # with_dist=False 면 반경 안 여부만 필요 (거리 자리에 None)
+        ky, kx = self._search_window(radius_m)
+        planar = self.backend == 'planar'
+        if planar:
+            inner2, outer2 = self._planar_band(radius_m, ky, kx)
+
+        # 격자 밖의 아파트도 가까운 셀 범위로 잘라서 처리 (범위 밖 셀은 비어 있음)
+        iy = np.floor((q_lat - self.lat0) / self.cell_dlat)
+        ix = np.floor((q_lng - self.lng0) / self.cell_dlng)
+        iy = np.clip(iy, -ky - 1, self.ny + ky).astype(np.int64)
+        ix = np.clip(ix, -kx - 1, self.nx + kx).astype(np.int64)
+        lo_x = np.clip(ix - kx, 0, self.nx - 1)
+        hi_x = np.clip(ix + kx, 0, self.nx - 1)
+        x_ok = (ix + kx >= 0) & (ix - kx <= self.nx - 1)
+        q_lat_rad, q_lng_rad = np.radians(q_lat), np.radians(q_lng)
+        q_cos = np.cos(q_lat_rad)
+        if planar:
+            q_y = (EARTH_RADIUS_M * (q_lat_rad - self.lat0_rad)).astype(np.float32)
+            q_x = (EARTH_RADIUS_M * (q_lng_rad - self.lng0_rad)).astype(np.float32)
+            q_cos32 = q_cos.astype(np.float32)
+
+        for dy in range(-ky, ky + 1):
+            row = iy + dy
+            row_ok = x_ok & (row >= 0) & (row < self.ny)
+            if not row_ok.any():
+                continue
+            row_c = np.clip(row, 0, self.ny - 1)
+            start = self.cell_start[row_c * self.nx + lo_x]
+            end = self.cell_start[row_c * self.nx + hi_x + 1]
+            lengths = np.where(row_ok, end - start, 0)
+            total = int(lengths.sum())
+            if total == 0:
+                continue
+            rep = np.repeat(np.arange(len(q_lat)), lengths)
+            offsets = np.cumsum(lengths) - lengths
+            fac = np.arange(total) - np.repeat(offsets, lengths) + np.repeat(start, lengths)
+            if not planar:
+                dist = haversine_rad(q_lat_rad[rep], q_lng_rad[rep], q_cos[rep],
+                                     self.lat_rad[fac], self.lng_rad[fac], self.cos_lat[fac])
+                hit = dist <= radius_m
+                yield q_idx[rep[hit]], fac[hit], dist[hit] if with_dist else None
+                continue
+
+            dy = self.y_m[fac] - q_y[rep]
+            dx = self.x_m[fac] - q_x[rep]
+            d2 = dy * dy + (q_cos32[rep] * self.cos_lat32[fac]) * (dx * dx)
+            hit = d2 <= inner2
+            band = np.flatnonzero(~hit & (d2 <= outer2))
+            if len(band):
+                r, f = rep[band], fac[band]
+                hit[band] = haversine_rad(q_lat_rad[r], q_lng_rad[r], q_cos[r],
+                                          self.lat_rad[f], self.lng_rad[f], self.cos_lat[f]) <= radius_m
+            rep, fac = rep[hit], fac[hit]
+            dist = None
+            if with_dist:
+                dist = haversine_rad(q_lat_rad[rep], q_lng_rad[rep], q_cos[rep],
+                                     self.lat_rad[fac], self.lng_rad[fac], self.cos_lat[fac])
+            yield q_idx[rep], fac, dist
+
+    def count_within(self, apt_lat, apt_lng, radius_m):
+        # 아파트별 반경 내 시설 수 (haversine 기준, 경계 포함)
+        apt_lat = np.asarray(apt_lat, dtype=np.float64)
+        apt_lng = np.asarray(apt_lng, dtype=np.float64)
+        counts = np.zeros(len(apt_lat), dtype=np.int64)
+        if self.size == 0:
+            return counts
+        for q_lat, q_lng, q_idx in self._iter_chunks(apt_lat, apt_lng):
+            for apt_idx, _, _ in self._iter_candidates(q_lat, q_lng, q_idx, radius_m, with_dist=False):
+                counts += np.bincount(apt_idx, minlength=len(apt_lat))
+        return counts
+
+    def query_radius_chunks(self, apt_lat, apt_lng, radius_m, chunk_size=QUERY_CHUNK_SIZE):
+        # 아파트 묶음 단위로 반경 내 (아파트 위치, 시설 원래 위치, 거리) 쌍을 (아파트, 거리) 순으로 반환
+        # 작업 메모리는 묶음 하나의 후보 쌍 수에 비례 -> 반경이 크면 chunk_size 를 줄여 호출
+        apt_lat = np.asarray(apt_lat, dtype=np.float64)
+        apt_lng = np.asarray(apt_lng, dtype=np.float64)
+        if self.size == 0:
+            return
+        for q_lat, q_lng, q_idx in self._iter_chunks(apt_lat, apt_lng, chunk_size):
+            parts = list(self._iter_candidates(q_lat, q_lng, q_idx, radius_m))
+            if not parts:
+                continue
+            apt_idx = np.concatenate([p[0] for p in parts])
+            fac = np.concatenate([p[1] for p in parts])
+            dist = np.concatenate([p[2] for p in parts])
+            order = np.lexsort((dist, apt_idx))
+            yield apt_idx[order], self.positions[fac[order]], dist[order]
+
+    def query_radius(self, apt_lat, apt_lng, radius_m):
+        parts = list(self.query_radius_chunks(apt_lat, apt_lng, radius_m))
+        if not parts:
+            return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0)
+        return tuple(np.concatenate([p[i] for p in parts]) for i in range(3))
+
+
+def build_spatial_index(df_infra, cell_m=DEFAULT_CELL_M, backend=None):
+    # 인프라 로드 결과 전체에 대해 유형별 격자 인덱스를 한 번에 생성
+    # 각 인덱스의 시설 위치(positions)는 해당 유형 부분집합(df_infra[type == t]) 기준
+    if df_infra is None or df_infra.empty:
+        return {}
+    index = {}
+    for infra_type, group in df_infra.groupby('type', sort=False):
+        index[infra_type] = GridSpatialIndex(group['lat'].values, group['lng'].values, cell_m, backend)
+    return index
+
+
+def top_k_order(total, k=None):
+    # total 내림차순 순위 (동점은 입력 순서). k 가 있으면 전체 정렬 대신 argpartition 으로
+    # 상위 k 개만 골라 정렬 -> 전체 안정 정렬 결과의 앞 k 개와 동일
+    n = len(total)
+    if k is None or k <= 0 or k >= n:
+        return np.argsort(-total, kind='stable')
+    neg = -total
+    kth = np.partition(neg, k - 1)[k - 1]
+    better = np.flatnonzero(neg < kth)
+    ties = np.flatnonzero(neg == kth)[:k - len(better)]
+    chosen = np.concatenate([better, ties])
+    return chosen[np.argsort(neg[chosen], kind='stable')]
+
+
+def assemble_filtered(df_apt, alive, counts, selected_filters, sort_by_total=True, top_k=None):
+    # 통과한 아파트 위치(alive)와 유형별 개수로 filter_apartments 결과 형식을 구성
+    # (원본 컬럼 + `_카운트` 컬럼, 총 개수 내림차순 / sort_by_total=False 면 입력 순서)
+    # top_k 가 있으면 순위 상위 k 개만 DataFrame 으로 만든다. 조건을 통과한 전체 개수는 attrs['matched'],
+    # 인덱스는 각 행의 df_apt 내 위치 (이웃 그래프를 아파트 위치로 슬라이스할 때 사용)
+    if len(alive) == 0:
+        return pd.DataFrame()
+    matched = len(alive)
+    order = None
+    if sort_by_total:
+        total = np.sum([counts[t] for t in selected_filters], axis=0)
+        order = top_k_order(total, top_k)
+        alive = alive[order]
+        counts = {t: c[order] for t, c in counts.items()}
+
+    df_filtered_apt = df_apt.iloc[alive].reset_index(drop=True)
+    for infra_type in selected_filters:
+        df_filtered_apt[f'{infra_type}_카운트'] = counts[infra_type]
+    if '자치구명' not in df_filtered_apt.columns:
+        df_filtered_apt['자치구명'] = ''
+    df_filtered_apt.index = alive
+    df_filtered_apt.attrs['matched'] = matched
+    return df_filtered_apt
+
+
+def apartment_coordinates(df_apt):
+    apt_lat = pd.to_numeric(df_apt['lat'], errors='coerce').to_numpy(dtype=np.float64)
+    apt_lng = pd.to_numeric(df_apt['lng'], errors='coerce').to_numpy(dtype=np.float64)
+    return apt_lat, apt_lng
+
+
+def filter_with_index(df_apt, spatial_index, selected_filters, sort_by_total=True, top_k=None):
+    # filter_apartments 와 동일한 의미: 선택된 모든 유형이 반경 내 1개 이상 (AND 조건)
+    if df_apt is None or df_apt.empty or not selected_filters:
+        return pd.DataFrame()
+
+    apt_lat, apt_lng = apartment_coordinates(df_apt)
+    alive = np.flatnonzero(np.isfinite(apt_lat) & np.isfinite(apt_lng))
+    counts = {}
+
+    for infra_type, radius_m in selected_filters.items():
+        index = spatial_index.get(infra_type)
+        if index is None or len(index) == 0:
+            return pd.DataFrame()
+        # 이미 탈락한 아파트는 다음 유형에서 질의하지 않음
+        c = index.count_within(apt_lat[alive], apt_lng[alive], radius_m)
+        keep = c > 0
+        alive = alive[keep]
+        for t in counts:
+            counts[t] = counts[t][keep]
+        counts[infra_type] = c[keep]
+        if len(alive) == 0:
+            return pd.DataFrame()
+
+    return assemble_filtered(df_apt, alive, counts, selected_filters, sort_by_total, top_k)
@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from spatial_index import DISTANCE_BACKENDS, haversine, build_spatial_index, filter_with_index
+from distance_profile import DistanceProfileSet, filter_with_profiles
+from infra_store import InfraStore
+from access_raster import AccessRaster, filter_with_raster
+
+# ====================================================================
+# --- 필터링 결과를 전수 haversine 개수와 비교 ---
+# ====================================================================
+# 고정 시드의 합성 아파트/시설로 filter_with_index(거리 백엔드별)와 filter_with_profiles 가
+# 아파트 x 시설 전수 비교(haversine <= 반경, 경계 포함)와 같은 통과 목록/개수를 내는지 확인
+
+SEED = 7
+BOX = (37.50, 37.60, 126.95, 127.05)   # 위도 최소/최대, 경도 최소/최대
+N_FACILITIES = {'초등학교': 200, '버스정류장': 800, '공원': 50}
+N_APARTMENTS = 500
+
+FILTER_COMBOS = [
+    {'초등학교': 500},
+    {'초등학교': 500, '버스정류장': 300},
+    {'공원': 1000, '초등학교': 800, '버스정류장': 200},
+    {'버스정류장': 100, '공원': 5000},
+]
+
+
+def _uniform(rng, n):
+    lat_min, lat_max, lng_min, lng_max = BOX
+    return rng.uniform(lat_min, lat_max, n), rng.uniform(lng_min, lng_max, n)
+
+
+@pytest.fixture(scope='module')
+def df_infra():
+    rng = np.random.default_rng(SEED)
+    parts = []
+    for infra_type, n in N_FACILITIES.items():
+        lat, lng = _uniform(rng, n)
+        parts.append(pd.DataFrame({'type': infra_type, 'infra_name': [f'{infra_type}{i}' for i in range(n)],
+                                   'lat': lat, 'lng': lng}))
+    return pd.concat(parts, ignore_index=True)
+
+
+@pytest.fixture(scope='module')
+def df_apt(df_infra):
+    rng = np.random.default_rng(SEED + 1)
+    lat, lng = _uniform(rng, N_APARTMENTS)
+    # 시설과 같은 좌표(거리 0)인 아파트와 좌표가 없는 아파트도 포함
+    on_facility = df_infra.sample(5, random_state=SEED)
+    lat = np.concatenate([lat, on_facility['lat'].values, [np.nan]])
+    lng = np.concatenate([lng, on_facility['lng'].values, [np.nan]])
+    return pd.DataFrame({'건물명': [f'아파트{i}' for i in range(len(lat))], 'lat': lat, 'lng': lng})
+
+
+def brute_force_counts(df_apt, df_infra, infra_type, radius_m):
+    fac = df_infra[df_infra['type'] == infra_type]
+    dist = haversine(df_apt['lat'].values[:, None], df_apt['lng'].values[:, None],
+                     fac['lat'].values[None, :], fac['lng'].values[None, :])
+    return (dist <= radius_m).sum(axis=1)
+
+
+def assert_matches_brute_force(df_result, df_apt, df_infra, selected_filters):
+    expected = {t: brute_force_counts(df_apt, df_infra, t, r) for t, r in selected_filters.items()}
+    passed = np.flatnonzero(np.all([c > 0 for c in expected.values()], axis=0))
+    if len(passed) == 0:
+        assert df_result.empty
+        return
+    # 결과 인덱스 = 업로드(df_apt) 내 위치
+    assert sorted(df_result.index) == passed.tolist()
+    for infra_type in selected_filters:
+        got = df_result[f'{infra_type}_카운트'].to_numpy()
+        np.testing.assert_array_equal(got, expected[infra_type][df_result.index], err_msg=infra_type)
+    total = df_result[[f'{t}_카운트' for t in selected_filters]].sum(axis=1).to_numpy()
+    assert (np.diff(total) <= 0).all()   # 총 개수 내림차순
+
+
+@pytest.mark.parametrize('backend', DISTANCE_BACKENDS)
+@pytest.mark.parametrize('selected_filters', FILTER_COMBOS, ids=lambda f: ','.join(f'{k}={v}' for k, v in f.items()))
+def test_filter_with_index_matches_brute_force(df_apt, df_infra, backend, selected_filters):
+    spatial_index = build_spatial_index(df_infra, backend=backend)
+    df_result = filter_with_index(df_apt, spatial_index, selected_filters)
+    assert_matches_brute_force(df_result, df_apt, df_infra, selected_filters)
+
+
+@pytest.mark.parametrize('budget_bytes', [None, 0], ids=['profiles', 'over-budget'])
+@pytest.mark.parametrize('selected_filters', FILTER_COMBOS, ids=lambda f: ','.join(f'{k}={v}' for k, v in f.items()))
+def test_filter_with_profiles_matches_brute_force(df_apt, df_infra, budget_bytes, selected_filters):
+    # budget_bytes=0: 모든 유형이 예산 초과로 거절되어 공간 인덱스로 직접 질의하는 경로
+    kwargs = {} if budget_bytes is None else {'budget_bytes': budget_bytes}
+    profiles = DistanceProfileSet(df_apt, build_spatial_index(df_infra), **kwargs)
+    df_result = filter_with_profiles(df_apt, profiles, selected_filters)
+    assert_matches_brute_force(df_result, df_apt, df_infra, selected_filters)
+
+
+@pytest.fixture(scope='module')
+def exact_radius_filters(df_apt, df_infra):
+    # 반경 = 실제 아파트-시설 거리 (경계 포함 비교와 평면 근사의 경계 보정 확인용)
+    rng = np.random.default_rng(SEED + 2)
+    combos = []
+    for infra_type, (low, high) in [('초등학교', (300, 1500)), ('버스정류장', (50, 400)), ('공원', (1000, 4900))]:
+        fac = df_infra[df_infra['type'] == infra_type]
+        dist = haversine(df_apt['lat'].values[:N_APARTMENTS, None], df_apt['lng'].values[:N_APARTMENTS, None],
+                         fac['lat'].values[None, :], fac['lng'].values[None, :]).ravel()
+        candidates = dist[(dist >= low) & (dist <= high)]
+        combos += [{infra_type: float(r)} for r in rng.choice(candidates, 3, replace=False)]
+    combos.append({'초등학교': combos[0]['초등학교'], '버스정류장': combos[3]['버스정류장']})
+    return combos
+
+
+@pytest.mark.parametrize('backend', DISTANCE_BACKENDS)
+def test_radius_equal_to_facility_distance(df_apt, df_infra, exact_radius_filters, backend):
+    spatial_index = build_spatial_index(df_infra, backend=backend)
+    profiles = DistanceProfileSet(df_apt, spatial_index)
+    for selected_filters in exact_radius_filters:
+        (infra_type, radius_m), = list(selected_filters.items())[:1]
+        assert (brute_force_counts(df_apt, df_infra, infra_type, radius_m) > 0).any()
+        assert_matches_brute_force(filter_with_index(df_apt, spatial_index, selected_filters),
+                                   df_apt, df_infra, selected_filters)
+        assert_matches_brute_force(filter_with_profiles(df_apt, profiles, selected_filters),
+                                   df_apt, df_infra, selected_filters)
+
+
+def test_top_k_keeps_highest_totals(df_apt, df_infra):
+    selected_filters = FILTER_COMBOS[1]
+    spatial_index = build_spatial_index(df_infra)
+    df_all = filter_with_index(df_apt, spatial_index, selected_filters)
+    df_top = filter_with_index(df_apt, spatial_index, selected_filters, top_k=10)
+    assert len(df_top) == 10
+    assert df_top.attrs['matched'] == len(df_all)
+    assert df_top.index.tolist() == df_all.index[:10].tolist()
+
+
+@pytest.fixture(scope='module')
+def coarse_raster(df_infra):
+    # 셀을 크게 잡아 경계(bound_m) 근처로 정확 검사에 넘어가는 아파트가 충분히 생기도록
+    return AccessRaster.build(InfraStore(df_infra), cell_m=250.0)
+
+
+def test_filter_with_raster_passes_same_apartments(df_apt, df_infra, exact_radius_filters, coarse_raster):
+    # 빠른 근사 모드: 개수는 근사지만 통과한 아파트 집합은 정확해야 함
+    spatial_index = build_spatial_index(df_infra)
+    decided_by_raster = 0
+    for selected_filters in FILTER_COMBOS + exact_radius_filters + [{'초등학교': 500, '공원': 6000}]:
+        expected = filter_with_index(df_apt, spatial_index, selected_filters)
+        df_result = filter_with_raster(df_apt, coarse_raster, spatial_index, selected_filters)
+        assert sorted(df_result.index) == sorted(expected.index), selected_filters
+        assert (df_result[[f'{t}_카운트' for t in selected_filters]] > 0).all().all()
+        decided_by_raster += len(df_apt) * len(selected_filters) - df_result.attrs['exact_checked']
+    assert decided_by_raster > 0
@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from query_service import QueryRejected, QueryService
+
+# ====================================================================
+# --- QueryService: 같은 키 합치기, 레인별 수용 제어 ---
+# ====================================================================
+
+
+def blocked(release, value=None):
+    def compute():
+        assert release.wait(5)
+        return value
+    return compute
+
+
+def wait_idle(service):
+    # 완료 콜백은 Future.result() 가 돌아온 뒤에 실행될 수 있음
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        stats = service.stats()
+        if stats['inflight'] == 0 and stats['light'] == 0 and stats['heavy'] == 0:
+            return stats
+        time.sleep(0.01)
+    raise AssertionError(service.stats())
+
+
+def test_same_key_is_coalesced_while_in_flight():
+    service = QueryService(workers=2)
+    release = threading.Event()
+    first, coalesced_first = service.submit('q', blocked(release, 'result'))
+    second, coalesced_second = service.submit('q', blocked(release, 'other'))
+    assert (coalesced_first, coalesced_second) == (False, True)
+    assert second is first
+    release.set()
+    assert second.result(5) == 'result'
+    stats = wait_idle(service)
+    assert (stats['submitted'], stats['coalesced']) == (1, 1)
+
+    # 끝난 질의는 합치지 않고 다시 계산
+    again, coalesced = service.submit('q', lambda: 'fresh')
+    assert not coalesced and again.result(5) == 'fresh'
+
+
+def test_full_lane_rejects_until_a_query_finishes():
+    service = QueryService(workers=1, heavy_workers=1, max_pending=2, max_heavy_pending=1, heavy_cost=100)
+    release = threading.Event()
+    try:
+        service.submit('a', blocked(release))       # 실행 중
+        service.submit('b', blocked(release))       # 대기
+        with pytest.raises(QueryRejected):
+            service.submit('c', blocked(release))
+        # 같은 키는 가득 찬 레인에서도 합쳐지고, 무거운 질의는 별도 레인이라 받아짐
+        assert service.submit('a', blocked(release))[1]
+        heavy, _ = service.submit('h', blocked(release), cost=100)
+        with pytest.raises(QueryRejected):
+            service.submit('h2', blocked(release), cost=100)
+    finally:
+        release.set()
+    heavy.result(5)
+    stats = wait_idle(service)
+    assert stats['rejected'] == 2
+    assert service.submit('c', lambda: 'ok')[0].result(5) == 'ok'
+
+
+def test_failed_query_is_counted_and_not_kept_in_flight():
+    service = QueryService(workers=1)
+
+    def fail():
+        raise ValueError('boom')
+
+    future, _ = service.submit('bad', fail)
+    with pytest.raises(ValueError):
+        future.result(5)
+    stats = wait_idle(service)
+    assert stats['failed'] == 1
+    assert not service.submit('bad', lambda: 'retry')[1]
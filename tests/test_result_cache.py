@@ -0,0 +1,86 @@
+import threading
+import time
+
+import numpy as np
+
+from result_cache import LRUResultCache
+
+# ====================================================================
+# --- LRUResultCache: 바이트 예산 LRU 제거, 예산 초과 값, 키별 단일 계산 ---
+# ====================================================================
+
+
+def block(n_bytes):
+    return np.zeros(n_bytes // 8, dtype=np.float64)
+
+
+def test_evicts_least_recently_used_within_byte_budget():
+    cache = LRUResultCache(max_bytes=3000)
+    for key in 'abc':
+        cache.put(key, block(1000))
+    cache.get('a')                      # b 가 가장 오래 안 쓴 항목이 됨
+    cache.put('d', block(1000))
+    assert cache.get('b') is None
+    assert all(cache.get(key) is not None for key in 'acd')
+    assert cache.current_bytes == 3000
+    assert cache.evictions == 1
+
+
+def test_oversized_value_is_returned_but_not_stored():
+    cache = LRUResultCache(max_bytes=3000)
+    cache.put('a', block(1000))
+    big = block(4000)
+    assert cache.put('a', big) is big   # 같은 키의 이전 값도 남지 않음
+    assert cache.get('a') is None
+    assert len(cache) == 0 and cache.current_bytes == 0
+    assert cache.oversized == 1
+
+
+def test_concurrent_get_or_compute_computes_once_per_key():
+    cache = LRUResultCache(max_bytes=1 << 20)
+    calls = []
+    results = []
+    start = threading.Barrier(8)
+
+    def compute():
+        calls.append(threading.get_ident())
+        time.sleep(0.05)
+        return block(800)
+
+    def worker():
+        start.wait()
+        results.append(cache.get_or_compute('key', compute))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert (cache.misses, cache.hits) == (1, 7)
+
+
+def test_different_keys_compute_in_parallel():
+    # 키별 잠금이라 다른 키의 계산은 서로 기다리지 않음 (직렬화되면 Barrier 가 시간 초과)
+    cache = LRUResultCache(max_bytes=1 << 20)
+    both_running = threading.Barrier(2, timeout=5)
+    errors = []
+
+    def compute():
+        both_running.wait()
+        return block(80)
+
+    def worker(key):
+        try:
+            cache.get_or_compute(key, compute)
+        except threading.BrokenBarrierError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(key,)) for key in ('x', 'y')]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert len(cache) == 2
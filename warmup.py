@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import contextlib
+import urllib.error
+import urllib.request
+
+import infra_data
+import profiling
+
+# ====================================================================
+# --- 기동 워밍업 (인프라 로드 + 사전 계산 + 지도 모듈 import) 과 준비 상태 확인 ---
+# ====================================================================
+# 서버 프로세스에서는 app.get_warmup() 이 첫 스크립트 실행 때 백그라운드 스레드로 워밍업을 시작하고,
+# 끝나면 READY_FILE 에 (pid, 인프라 서명, 단계별 시간)을 기록한다. 오케스트레이터는
+#   python warmup.py check --url http://localhost:8501
+# 를 준비 상태 확인(readiness probe)으로 쓰면 된다. --url 을 주면 Streamlit 의 스크립트 상태 확인
+# (server.scriptHealthCheckEnabled = true 일 때 /_stcore/script-health-check)을 호출해 방문자 없이도
+# 워밍업을 시작시키고, 워밍업이 끝난 프로세스가 살아 있고 인프라 서명이 최신일 때만 0 으로 종료한다.
+#
+# 배포 이미지/기동 전에는 python warmup.py run 으로 스냅샷을 갱신하고 단계별 시간을 확인한다.
+# 스냅샷 디렉터리가 읽기 전용인 배포에서는 INFRA_READY_FILE 로 쓰기 가능한 경로(예: /tmp/ready.json)를 지정
+# (서버와 check 가 같은 값을 보도록 두 프로세스 모두에 설정).
+
+READY_FILE = os.environ.get('INFRA_READY_FILE', os.path.join(infra_data.SNAPSHOT_DIR, 'ready.json'))
+PROBE_TIMEOUT_S = 5
+
+
+class WarmupReport:
+    # 워밍업 1회의 단계별 기록. done 은 워밍업 종료(성공/실패 무관) 시 설정
+    def __init__(self):
+        self.phases = []
+        self.started = time.perf_counter()
+        self.total_ms = None
+        self.error = None
+        self.done = threading.Event()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        rec = {'phase': name}
+        self.phases.append(rec)
+        started = time.perf_counter()
+        try:
+            yield rec
+        finally:
+            rec['ms'] = round((time.perf_counter() - started) * 1000, 2)
+            profiling.logger.info(json.dumps({'ts': round(time.time(), 3), 'event': 'warmup_phase', 'pid': os.getpid(), **rec},
+                                             ensure_ascii=False, default=str))
+
+    def finish(self, error=None):
+        self.error = error
+        self.total_ms = round((time.perf_counter() - self.started) * 1000, 2)
+        self.done.set()
+
+    @property
+    def ready(self):
+        return self.done.is_set() and self.error is None
+
+    def summary(self):
+        # 진단 패널/CLI 한 줄 요약: "import_map_modules 312 ms · load_infrastructure 95 ms · ..."
+        return " · ".join(f"{p['phase']} {p['ms']:.0f} ms" if 'ms' in p else f"{p['phase']} ..." for p in self.phases)
+
+
+def import_map_modules():
+    # 지도 렌더링 모듈은 app 에서 지연 import -> 첫 지도 요청 전에 미리 적재
+    import folium
+    import folium.plugins
+    import streamlit.components.v1
+    return folium.__version__
+
+
+def run_warmup(load_store, load_raster=None, report=None):
+    # load_store(): 인프라 저장소 반환 (서버에서는 st.cache_resource 함수라 결과가 세션들과 공유됨)
+    # load_raster(): 접근성 래스터 (없으면 None)
+    report = report or WarmupReport()
+    # 첫 화면에 바로 필요한 인프라/인덱스를 먼저, 지도 모듈은 마지막에 (첫 지도는 필터 선택 후에 그려짐)
+    try:
+        with report.phase('load_infrastructure') as rec:
+            store = load_store()
+            rec['rows'] = len(store)
+        with report.phase('spatial_index') as rec:
+            rec['types'] = len(store.spatial_index())
+        if load_raster is not None:
+            with report.phase('access_raster') as rec:
+                rec['loaded'] = load_raster() is not None
+        with report.phase('import_map_modules') as rec:
+            rec['folium'] = import_map_modules()
+    except Exception as e:
+        report.finish(f"{type(e).__name__}: {e}")
+        return report
+    report.finish()
+    return report
+
+
+def _signature_key(signature):
+    # 인프라 서명(튜플)을 준비 파일에 저장/비교할 수 있는 문자열로
+    return json.dumps(signature, ensure_ascii=False, default=str)
+
+
+def _process_identity(pid):
+    # pid 재사용(컨테이너 재시작 후 같은 pid 등)과 구분하기 위한 프로세스 식별자: 부팅 id + 프로세스 시작 시각(틱).
+    # /proc 가 없는 환경에서는 None (pid 생존 여부만 확인)
+    try:
+        with open('/proc/sys/kernel/random/boot_id', encoding='ascii') as f:
+            boot_id = f.read().strip()
+        with open(f'/proc/{pid}/stat', encoding='ascii') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # comm(괄호 안 실행 파일명)에 공백이 있을 수 있으므로 마지막 ')' 뒤부터 나눔. starttime 은 22번째 필드
+    return f"{boot_id}:{stat.rsplit(')', 1)[1].split()[19]}"
+
+
+def write_ready(report, signature, path=READY_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = {'pid': os.getpid(), 'process': _process_identity(os.getpid()), 'signature': _signature_key(signature),
+               'ready_at': round(time.time(), 3), 'total_ms': report.total_ms, 'phases': report.phases}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+
+
+def _log_ready_file_error(path, error):
+    profiling.logger.warning(json.dumps({'ts': round(time.time(), 3), 'event': 'warmup_ready_file_failed',
+                                         'pid': os.getpid(), 'path': path,
+                                         'error': f"{type(error).__name__}: {error}"}, ensure_ascii=False))
+
+
+def start_background(load_store, load_raster=None, signature=None, ready_path=READY_FILE):
+    # 워밍업을 데몬 스레드에서 시작하고 즉시 보고서 반환. 성공하면 준비 파일 기록
+    # (이전 프로세스가 남긴 준비 파일은 먼저 지워 워밍업이 끝나기 전에 준비됨으로 보이지 않게 함)
+    report = WarmupReport()
+    if ready_path:
+        try:
+            os.remove(ready_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            _log_ready_file_error(ready_path, e)
+
+    def work():
+        run_warmup(load_store, load_raster, report)
+        if report.ready and ready_path:
+            try:
+                write_ready(report, signature, ready_path)
+            except OSError as e:
+                # 준비 파일을 못 쓰면 check 는 계속 준비 안 됨 -> 원인을 로그로 남김
+                _log_ready_file_error(ready_path, e)
+
+    threading.Thread(target=work, name='infra-warmup', daemon=True).start()
+    return report
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def check_ready(path=READY_FILE):
+    # 반환: (준비 여부, 메시지)
+    try:
+        with open(path, encoding='utf-8') as f:
+            ready = json.load(f)
+    except (OSError, ValueError):
+        return False, "⏳ 워밍업 기록이 없습니다."
+    pid = ready.get('pid', -1)
+    identity = _process_identity(pid)
+    if not _pid_alive(pid) or (identity is not None and ready.get('process') != identity):
+        return False, f"⏳ 워밍업한 서버 프로세스(pid {ready.get('pid')})가 실행 중이 아닙니다."
+    if ready.get('signature') != _signature_key(infra_data.source_signature()):
+        return False, "⏳ 인프라 원본이 바뀌어 다시 워밍업해야 합니다."
+    return True, f"✅ 준비 완료 (pid {ready['pid']}, {ready['total_ms']:.0f} ms)"
+
+
+def trigger(url):
+    # 스크립트 상태 확인 엔드포인트를 호출해 서버가 앱 스크립트를 한 번 실행하도록 함 (-> 워밍업 시작)
+    try:
+        with urllib.request.urlopen(f"{url.rstrip('/')}/_stcore/script-health-check", timeout=PROBE_TIMEOUT_S):
+            pass
+    except (urllib.error.URLError, OSError):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="대시보드 기동 워밍업 / 준비 상태 확인")
+    parser.add_argument('command', choices=['run', 'check'], nargs='?', default='run',
+                        help="run: 이 프로세스에서 워밍업 후 단계별 시간 출력 (스냅샷 갱신 포함), "
+                             "check: 서버 프로세스의 워밍업 완료 여부 (준비되면 종료 코드 0)")
+    parser.add_argument('--url', default=None, help="check 전에 워밍업을 시작시킬 Streamlit 서버 주소")
+    args = parser.parse_args(argv)
+
+    if args.command == 'check':
+        if args.url:
+            trigger(args.url)
+        ok, message = check_ready()
+        print(message)
+        return 0 if ok else 1
+
+    from infra_store import InfraStore
+    from access_raster import AccessRaster
+
+    loaded = {}
+
+    def load_store():
+        df_infra, debug_info = infra_data.load_all_infrastructure_data()
+        loaded['infra'] = InfraStore(df_infra, debug_info)
+        return loaded['infra']
+
+    report = run_warmup(load_store, lambda: AccessRaster.load(loaded['infra']))
+    for rec in report.phases:
+        extra = ", ".join(f"{k}={v}" for k, v in rec.items() if k not in ('phase', 'ms'))
+        print(f"  {rec['phase']:<20} {rec['ms']:>9.1f} ms  {extra}")
+    if report.error:
+        print(f"❌ 워밍업 실패: {report.error}", file=sys.stderr)
+        return 1
+    print(f"✅ 워밍업 완료 ({report.total_ms:.0f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())